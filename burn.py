@@ -4,6 +4,8 @@ from tkinter import messagebox
 from tkinter import ttk
 import subprocess
 import threading
+import queue
+import mmap
 import hashlib
 import os
 import sys
@@ -11,6 +13,15 @@ import time
 
 LOG_FILE = "burner.log"
 
+UI_POLL_MS = 100         # how often the Tk loop drains worker events
+PROGRESS_INTERVAL = 0.1  # writers publish progress at most this often (seconds)
+
+MB = 1024 * 1024
+BLOCK_SIZES = [4, 8, 16, 32, 64]  # MB, offered in the UI
+DEFAULT_BLOCK = 16 * MB
+RING_DEPTH = 3                   # buffers in flight: one being read, one being written, one spare (+1 per device)
+DIRECT_ALIGN = 4096              # O_DIRECT sector alignment; 4K covers both 512e and 4Kn devices
+
 # -----------------------------
 # Logging
 # -----------------------------
@@ -18,6 +29,71 @@ def log(msg):
     with open(LOG_FILE, "a") as f:
         f.write(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] {msg}\n")
 
+# -----------------------------
+# UI event pipeline
+# -----------------------------
+# Tk is not thread-safe: worker threads never touch widgets, they post
+# events here and the main loop applies them from poll_ui().
+ui_events = queue.Queue()
+
+def post(kind, *args):
+    ui_events.put((kind, args))
+
+STAGES = ("Writing", "Flushing", "Verifying")
+device_state = {}  # device -> (stage index, percent, stage, rate) for the overall bar
+
+def show_device(device, stage, done, size, rate):
+    percent = done / size * 100 if size else 100
+    if targets_view.exists(device):
+        targets_view.item(device, values=(device, stage, f"{percent:.1f}%", f"{rate / 1e6:.1f} MB/s"))
+    device_state[device] = (STAGES.index(stage), percent, stage, rate)
+    show_overall()
+
+def show_result(device, text):
+    if targets_view.exists(device):
+        targets_view.set(device, "stage", text)
+    device_state[device] = (len(STAGES), 100.0, text, 0)
+    show_overall()
+
+def show_overall():
+    # The main bar follows the slowest device that is still in progress.
+    active = [st for st in device_state.values() if st[0] < len(STAGES)]
+    if not active:
+        return
+    _, percent, stage, rate = min(active)
+    progress_var.set(percent)
+    slowest = f", slowest of {len(device_state)}" if len(device_state) > 1 else ""
+    status_var.set(f"{stage}... {percent:.2f}%  ({rate / 1e6:.1f} MB/s{slowest})")
+
+def poll_ui():
+    # Only the newest progress sample per device matters; pending samples are
+    # applied before any other event so a late one can't overwrite a newer status.
+    progress = {}
+    try:
+        while True:
+            kind, args = ui_events.get_nowait()
+            if kind == "progress":
+                progress[args[0]] = args
+                continue
+            for p in progress.values():
+                show_device(*p)
+            progress.clear()
+            if kind == "result":
+                show_result(*args)
+            elif kind == "status":
+                status_var.set(args[0])
+            elif kind == "info":
+                messagebox.showinfo(*args)
+            elif kind == "error":
+                messagebox.showerror(*args)
+            elif kind == "done":
+                burn_btn.config(state=tk.NORMAL)
+    except queue.Empty:
+        pass
+    for p in progress.values():
+        show_device(*p)
+    root.after(UI_POLL_MS, poll_ui)
+
 # -----------------------------
 # KDE Native File Dialog
 # -----------------------------
@@ -71,14 +147,265 @@ def is_mounted(device):
         return False
 
 # -----------------------------
-# SHA256 checksum
+# Buffer ring (reader -> writer pipeline)
+# -----------------------------
+class BufferRing:
+    """Preallocated buffers cycled between a reader thread and its consumers.
+
+    Buffers are anonymous mmaps, so they are page-aligned and allocated once;
+    the reader fills them with readinto() while the consumers drain the
+    previous ones, overlapping source reads with device writes. A single
+    consumer iterates blocks(); several (one writer per device) get every
+    block through share() and hand it back with release().
+    """
+
+    def __init__(self, block, depth=RING_DEPTH, drop_cache=False):
+        self.block = block
+        self.drop_cache = drop_cache  # drop source pages once read, so a big image doesn't evict the host's cache
+        self.free = queue.Queue()
+        self.full = queue.Queue()
+        self.stop = threading.Event()
+        self.lock = threading.Lock()
+        self.refs = {}  # id(buf) -> consumers still holding it
+        for _ in range(depth):
+            self.free.put(mmap.mmap(-1, block))
+
+    def fill_from(self, path, limit=None, direct=False):
+        # Reader thread: queues (buf, n) per block, then (None, 0) at EOF
+        # (or after `limit` bytes) or (None, exception) if reading fails.
+        try:
+            with open_for_read(path, direct) as f:
+                offset = 0
+                while not self.stop.is_set() and (limit is None or offset < limit):
+                    try:
+                        buf = self.free.get(timeout=0.2)
+                    except queue.Empty:
+                        continue
+                    want = self.block
+                    if limit is not None:
+                        # direct reads must stay sector-sized; the overshoot is trimmed below
+                        want = min(want, -(-(limit - offset) // DIRECT_ALIGN) * DIRECT_ALIGN)
+                    view, n = memoryview(buf), 0
+                    while n < want:
+                        got = f.readinto(view[n:want])
+                        if not got:
+                            break
+                        n += got
+                    eof = n < want
+                    if limit is not None:
+                        n = min(n, limit - offset)
+                    if n:
+                        self.full.put((buf, n))
+                        if self.drop_cache and hasattr(os, "posix_fadvise"):
+                            os.posix_fadvise(f.fileno(), offset, n, os.POSIX_FADV_DONTNEED)
+                        offset += n
+                    if eof:
+                        break
+            self.full.put((None, 0))
+        except Exception as e:
+            self.full.put((None, e))
+
+    def start_reader(self, path, limit=None, direct=False):
+        threading.Thread(target=self.fill_from, args=(path, limit, direct), daemon=True).start()
+
+    def blocks(self):
+        # Writer side: yields each filled block in order; its buffer goes
+        # back to the reader when the next block is requested.
+        while True:
+            buf, n = self.full.get()
+            if buf is None:
+                if isinstance(n, Exception):
+                    raise n
+                return
+            yield memoryview(buf)[:n]
+            self.free.put(buf)
+
+    def share(self, consumers):
+        # Fan-out: every filled block goes to each consumer queue, followed by
+        # the reader's (None, 0 | exception) end marker, which is also returned.
+        # The slowest consumer holding a buffer paces the reader.
+        while True:
+            buf, n = self.full.get()
+            if buf is not None:
+                with self.lock:
+                    self.refs[id(buf)] = len(consumers)
+            for q in consumers:
+                q.put((buf, n))
+            if buf is None:
+                return n or None
+
+    def release(self, buf):
+        with self.lock:
+            self.refs[id(buf)] -= 1
+            if self.refs[id(buf)]:
+                return
+            del self.refs[id(buf)]
+        self.free.put(buf)
+
+    def close(self):
+        self.stop.set()
+
+def write_all(fd, data):
+    while data:
+        data = data[os.write(fd, data):]
+
+# -----------------------------
+# Direct I/O
 # -----------------------------
-def sha256sum(path):
+def open_device(device, direct):
+    # Returns (fd, direct); falls back to buffered writes if the target
+    # (or the platform) doesn't support O_DIRECT.
+    if direct and hasattr(os, "O_DIRECT"):
+        try:
+            return os.open(device, os.O_WRONLY | os.O_DIRECT), True
+        except OSError as e:
+            log(f"O_DIRECT unavailable for {device} ({e}), using buffered writes")
+    return os.open(device, os.O_WRONLY), False
+
+def open_for_read(path, direct=False):
+    # Unbuffered reader. With direct=True the page cache is bypassed, so a
+    # read-back sees what the device actually stored; where O_DIRECT isn't
+    # available the cached pages are dropped first instead.
+    if direct and hasattr(os, "O_DIRECT"):
+        try:
+            return open(os.open(path, os.O_RDONLY | os.O_DIRECT), "rb", buffering=0)
+        except OSError as e:
+            log(f"O_DIRECT read unavailable for {path} ({e}), dropping cached pages instead")
+    f = open(path, "rb", buffering=0)
+    if direct and hasattr(os, "posix_fadvise"):
+        os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_DONTNEED)
+    return f
+
+def write_tail(device, data, offset):
+    # O_DIRECT can't write a partial sector, so an unaligned tail goes
+    # through a regular fd at its offset.
+    fd = os.open(device, os.O_WRONLY)
+    try:
+        while data:
+            n = os.pwrite(fd, data, offset)
+            data, offset = data[n:], offset + n
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+# -----------------------------
+# Read-back verification
+# -----------------------------
+def hash_device(device, size, block=DEFAULT_BLOCK, report=None):
+    # Reads the first `size` bytes back from the device, bypassing the page
+    # cache. The reader thread fetches the next block while this thread
+    # hashes the current one, so this costs about one sequential read.
+    # report(done, rate) is called at most every PROGRESS_INTERVAL.
+    ring = BufferRing(block)
     h = hashlib.sha256()
-    with open(path, "rb") as f:
-        while chunk := f.read(1024 * 1024):
-            h.update(chunk)
-    return h.hexdigest()
+    done = 0
+    start = last = time.monotonic()
+    try:
+        ring.start_reader(device, limit=size, direct=True)
+        for data in ring.blocks():
+            h.update(data)
+            done += len(data)
+
+            now = time.monotonic()
+            if report and now - last >= PROGRESS_INTERVAL:
+                report(done, done / (now - start))
+                last = now
+    finally:
+        ring.close()
+    return h.hexdigest(), done
+
+def hash_source(ring, q, h):
+    # One more consumer of the shared ring: the image is hashed while it is
+    # written, so it is read only once. hashlib releases the GIL, so this
+    # runs alongside the device writers.
+    while True:
+        buf, n = q.get()
+        if buf is None:
+            return
+        try:
+            h.update(memoryview(buf)[:n])
+        finally:
+            ring.release(buf)
+
+# -----------------------------
+# Per-device writer
+# -----------------------------
+class Target:
+    """One device being flashed; run() is its writer thread."""
+
+    def __init__(self, device):
+        self.device = device
+        self.queue = queue.Queue()  # blocks fanned out by BufferRing.share()
+        self.written = 0
+        self.digest = None          # SHA256 of what was read back
+        self.error = None
+
+    def progress(self, stage, done, size, rate):
+        post("progress", self.device, stage, done, size, rate)
+
+    def run(self, ring, size, block, direct):
+        try:
+            self.write(ring, size, direct)
+            if self.error is None:
+                self.verify(size, block)
+        except Exception as e:
+            self.error = self.error or e
+
+    def write(self, ring, size, direct):
+        # Every buffer is released even after this device fails, so one bad
+        # stick never stalls the others.
+        fd = None
+        try:
+            fd, direct = open_device(self.device, direct)
+        except OSError as e:
+            self.error = e
+        start = last = time.monotonic()
+        try:
+            while True:
+                buf, n = self.queue.get()
+                if buf is None:
+                    if n:
+                        self.error = self.error or n
+                    break
+                try:
+                    if self.error is None:
+                        self.write_block(fd, memoryview(buf)[:n], direct)
+                        self.written += n
+                except Exception as e:
+                    self.error = e
+                finally:
+                    ring.release(buf)
+
+                now = time.monotonic()
+                if self.error is None and now - last >= PROGRESS_INTERVAL:
+                    self.progress("Writing", self.written, size, self.written / (now - start))
+                    last = now
+
+            if self.error is None:
+                self.progress("Flushing", self.written, size, self.written / max(time.monotonic() - start, 1e-6))
+                os.fsync(fd)
+        finally:
+            if fd is not None:
+                os.close(fd)
+
+    def write_block(self, fd, data, direct):
+        tail = len(data) % DIRECT_ALIGN if direct else 0
+        if tail:
+            write_all(fd, data[:-tail])
+            write_tail(self.device, data[-tail:], self.written + len(data) - tail)
+        else:
+            write_all(fd, data)
+
+    def verify(self, size, block):
+        self.digest, read = hash_device(self.device, size, block,
+                                        lambda done, rate: self.progress("Verifying", done, size, rate))
+        if read < size:
+            raise IOError(f"device returned only {read} of {size} bytes")
+
+def describe(error):
+    if isinstance(error, PermissionError):
+        return "Permission denied (try running with sudo)"
+    return str(error)
 
 # -----------------------------
 # Start burning thread
@@ -95,83 +422,97 @@ def start_burn():
         messagebox.showerror("Error", "No target device selected.")
         return
 
-    device_line = devices_list.get(sel[0])
-    device = device_line.split()[0]
+    devices = [devices_list.get(i).split()[0] for i in sel]
 
-    if is_mounted(device):
-        messagebox.showerror("Error", "Device is mounted. Unmount it first.")
+    mounted = [d for d in devices if is_mounted(d)]
+    if mounted:
+        messagebox.showerror("Error", "Device is mounted. Unmount it first:\n" + "\n".join(mounted))
         return
 
     ok = messagebox.askyesno(
         "Confirm",
-        f"Are you sure you want to write to {device}?\nThis will ERASE all data on the device."
+        f"Are you sure you want to write to {', '.join(devices)}?\n"
+        f"This will ERASE all data on {'the device' if len(devices) == 1 else f'all {len(devices)} devices'}."
     )
 
     if not ok:
         return
 
-    threading.Thread(target=burn_image, args=(img, device), daemon=True).start()
+    block = int(block_var.get().split()[0]) * MB
+
+    burn_btn.config(state=tk.DISABLED)
+    status_var.set("Starting write...")
+    progress_var.set(0)
+    device_state.clear()
+    targets_view.delete(*targets_view.get_children())
+    for d in devices:
+        targets_view.insert("", tk.END, iid=d, values=(d, "Starting", "0.0%", ""))
+    threading.Thread(target=burn_image, args=(img, devices, block, direct_var.get()), daemon=True).start()
 
 # -----------------------------
 # Burn image to device
 # -----------------------------
-def burn_image(img, device):
+# Runs on a worker thread: all UI updates go through post().
+# One reader fills the shared ring and every device gets its own writer
+# thread, so N devices take about as long as the slowest one. With direct
+# I/O each write returns once the device has the data, so progress tracks
+# committed bytes and the final fsync has little left to do.
+def burn_image(img, devices, block=DEFAULT_BLOCK, direct=False):
+    ring = None
     try:
-        burn_btn.config(state=tk.DISABLED)
-        status_var.set("Starting write...")
-        progress_var.set(0)
-        progress_bar["value"] = 0
-        root.update_idletasks()
-
-        log(f"Burn started: {img} -> {device}")
-
         size = os.path.getsize(img)
-        written = 0
-        block = 1024 * 1024  # 1MB
-
-        with open(img, "rb") as f_img, open(device, "wb") as f_dev:
-            while True:
-                chunk = f_img.read(block)
-                if not chunk:
-                    break
-
-                f_dev.write(chunk)
-                written += len(chunk)
-
-                percent = written / size * 100
-                progress_var.set(percent)
-                progress_bar["value"] = percent
-                status_var.set(f"Writing... {percent:.2f}%")
-                root.update_idletasks()
-
-            f_dev.flush()
-            os.fsync(f_dev.fileno())
-
-        status_var.set("Write completed.")
-        log("Write completed successfully.")
+        targets = [Target(d) for d in devices]
+        log(f"Burn started: {img} -> {', '.join(devices)} "
+            f"(block {block // MB} MB, {'direct' if direct else 'buffered'})")
+
+        img_hash, hash_queue = hashlib.sha256(), queue.Queue()
+        ring = BufferRing(block, RING_DEPTH + len(targets), drop_cache=direct)
+        workers = [threading.Thread(target=t.run, args=(ring, size, block, direct), daemon=True)
+                   for t in targets]
+        workers.append(threading.Thread(target=hash_source, args=(ring, hash_queue, img_hash), daemon=True))
+        for w in workers:
+            w.start()
+        ring.start_reader(img)
+        read_error = ring.share([t.queue for t in targets] + [hash_queue])
+        for w in workers:
+            w.join()
+        if read_error:
+            raise read_error
+
+        digest = img_hash.hexdigest()
+        log(f"Image SHA256: {digest}")
 
         # -----------------------------
-        # Verify checksum
+        # Compare each device's read-back with the image
         # -----------------------------
-        status_var.set("Verifying checksum...")
-        root.update_idletasks()
-
-        img_hash = sha256sum(img)
-        log(f"Image SHA256: {img_hash}")
-
-        status_var.set("Checksum complete.")
-        messagebox.showinfo("Success", "Image written and verified successfully.")
-
-    except PermissionError:
-        messagebox.showerror("Error", "Permission denied.\nTry running with sudo.")
-        log("Permission error.")
+        failed = []
+        for t in targets:
+            if t.error is None and t.digest != digest:
+                t.error = IOError(f"data read back does not match the image (device SHA256 {t.digest})")
+            if t.error:
+                failed.append(f"{t.device}: {describe(t.error)}")
+                post("result", t.device, "FAILED")
+                log(f"{t.device}: FAILED: {t.error}")
+            else:
+                post("result", t.device, "Verified")
+                log(f"{t.device}: written and verified.")
+
+        if failed:
+            post("status", f"{len(targets) - len(failed)} of {len(targets)} devices verified.")
+            post("error", "Burn failed", "\n".join(failed))
+        else:
+            post("status", "Write verified." if len(targets) == 1 else
+                 f"All {len(targets)} devices written and verified.")
+            post("info", "Success", f"Image written and verified on {', '.join(devices)}.\nSHA256: {digest}")
 
     except Exception as e:
-        messagebox.showerror("Error", str(e))
+        post("error", "Error", describe(e))
         log(f"Write error: {e}")
 
     finally:
-        burn_btn.config(state=tk.NORMAL)
+        if ring:
+            ring.close()
+        post("done")
 
 # -----------------------------
 # GUI Setup
@@ -188,19 +529,35 @@ tk.Entry(root, textvariable=img_var, width=60).pack(padx=10)
 
 tk.Button(root, text="Browse (KDE Native)", command=choose_image_kde).pack(padx=10, pady=5)
 
-tk.Label(root, text="Available disks:").pack(anchor="w", padx=10, pady=(10, 0))
-devices_list = tk.Listbox(root, width=60, height=7)
+tk.Label(root, text="Available disks (Ctrl/Shift-click to flash several at once):").pack(anchor="w", padx=10, pady=(10, 0))
+devices_list = tk.Listbox(root, width=60, height=7, selectmode=tk.EXTENDED)
 devices_list.pack(padx=10)
 
 tk.Button(root, text="Refresh device list", command=refresh_devices).pack(pady=5)
 
+block_frame = tk.Frame(root)
+block_frame.pack(pady=5)
+tk.Label(block_frame, text="Block size:").pack(side=tk.LEFT)
+block_var = tk.StringVar(value=f"{DEFAULT_BLOCK // MB} MB")
+ttk.Combobox(block_frame, textvariable=block_var, state="readonly", width=8,
+             values=[f"{n} MB" for n in BLOCK_SIZES]).pack(side=tk.LEFT, padx=5)
+direct_var = tk.BooleanVar(value=hasattr(os, "O_DIRECT"))
+tk.Checkbutton(block_frame, text="Direct I/O (bypass page cache)", variable=direct_var).pack(side=tk.LEFT, padx=10)
+
 progress_bar = ttk.Progressbar(root, variable=progress_var, maximum=100, length=400)
 progress_bar.pack(pady=5)
 
-burn_btn = tk.Button(root, text="Burn image to device", command=start_burn, bg="lightblue")
+targets_view = ttk.Treeview(root, columns=("device", "stage", "progress", "speed"), show="headings", height=4)
+for col, width in (("device", 160), ("stage", 110), ("progress", 80), ("speed", 100)):
+    targets_view.heading(col, text=col.capitalize())
+    targets_view.column(col, width=width)
+targets_view.pack(padx=10, pady=5)
+
+burn_btn = tk.Button(root, text="Burn image to selected devices", command=start_burn, bg="lightblue")
 burn_btn.pack(pady=10)
 
 tk.Label(root, textvariable=status_var).pack(pady=(0, 10))
 
 refresh_devices()
+root.after(UI_POLL_MS, poll_ui)
 root.mainloop()
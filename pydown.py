@@ -7,27 +7,37 @@ PyDown - Professional Download Manager
 
 הרצה:
     python pydown.py
+
+הרצה ללא ממשק (בלי PyQt6):
+    python pydown_cli.py URL [URL ...]
 """
 
 import sys
 import os
-import math
 import time
-import threading
-import requests
-from urllib.parse import urlparse, unquote
+from datetime import datetime
 from pathlib import Path
 
+from pydown_core import (
+    format_size, format_speed, format_eta, unique_path, probe,
+    parse_rate, parse_schedule, LIMITER, DownloadQueue, DownloadHistory, DownloadCache,
+    Downloader, AsyncEngine, AsyncDownload, ENGINE,
+    queue_connections, MetricsServer, SESSIONS
+)
+
 from PyQt6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
-    QPushButton, QLineEdit, QLabel, QFileDialog, QTableWidget,
-    QTableWidgetItem, QHeaderView, QProgressBar, QDialog,
-    QMessageBox, QFrame, QSizePolicy, QAbstractItemView, QStatusBar,
-    QToolBar
+    QPushButton, QLineEdit, QLabel, QFileDialog, QCheckBox,
+    QTableView, QTableWidget, QTableWidgetItem, QHeaderView, QDialog, QStyledItemDelegate,
+    QMessageBox, QFrame, QAbstractItemView, QStatusBar,
+    QToolBar, QInputDialog
+)
+from PyQt6.QtCore import (
+    Qt, QObject, QThread, pyqtSignal, QTimer, QSize, QAbstractTableModel, QModelIndex, QRectF,
+    QSortFilterProxyModel
 )
-from PyQt6.QtCore import Qt, QThread, pyqtSignal, QTimer, QSize
 from PyQt6.QtGui import (
-    QColor, QPalette, QFont, QAction
+    QColor, QPalette, QFont, QAction, QPainter
 )
 
 
@@ -113,7 +123,7 @@ QLineEdit:focus {{
     border-color: {COLORS["accent"]};
     background-color: {COLORS["bg_hover"]};
 }}
-QTableWidget {{
+QTableView {{
     background-color: transparent;
     border: none;
     gridline-color: {COLORS["border"]};
@@ -121,12 +131,12 @@ QTableWidget {{
     alternate-background-color: rgba(255,255,255,0.02);
     outline: none;
 }}
-QTableWidget::item {{
+QTableView::item {{
     padding: 10px 12px;
     border-bottom: 1px solid {COLORS["border"]};
     color: {COLORS["text_primary"]};
 }}
-QTableWidget::item:selected {{
+QTableView::item:selected {{
     background-color: {COLORS["bg_hover"]};
     color: {COLORS["accent"]};
 }}
@@ -184,152 +194,74 @@ QProgressBar::chunk {{
 }}
 """
 
-
-# ─── Utilities ────────────────────────────────────────────────────────────────
-
-def format_size(b):
-    if b <= 0: return "0 B"
-    units = ["B","KB","MB","GB","TB"]
-    i = min(int(math.floor(math.log(b, 1024))), 4)
-    return f"{round(b / math.pow(1024, i), 2)} {units[i]}"
-
-def format_speed(bps):
-    return f"{format_size(bps)}/s" if bps > 0 else "—"
-
-def format_eta(sec):
-    if sec <= 0 or sec == float('inf'): return "—"
-    m, s = divmod(int(sec), 60)
-    h, m = divmod(m, 60)
-    return f"{h:02d}:{m:02d}:{s:02d}" if h else f"{m:02d}:{s:02d}"
-
-def get_filename(url, headers=None):
-    if headers:
-        cd = headers.get('content-disposition', '')
-        if 'filename=' in cd:
-            return cd.split('filename=')[-1].strip().strip('"\'')
-    name = unquote(os.path.basename(urlparse(url).path))
-    return name or f"download_{int(time.time())}"
-
-
-# ─── Download Worker ──────────────────────────────────────────────────────────
+# ─── Download Workers ─────────────────────────────────────────────────────────
 
 class DownloadWorker(QThread):
-    progress       = pyqtSignal(int, int, int, float, float)  # row, dl, total, speed, eta
-    finished       = pyqtSignal(int, bool, str)
+    """מתאם Qt ל-Downloader - מריץ את ההורדה ב-QThread ומתרגם callbacks לסיגנלים"""
+    progress       = pyqtSignal(int, int, int, float, float)  # id, dl, total, speed, eta
+    finished       = pyqtSignal(int, bool, str, str)  # id, ok, msg, status
     status_changed = pyqtSignal(int, str)
 
-    def __init__(self, row, url, save_path, threads=8):
+    def __init__(self, did, url, save_path, threads=8, preallocate=True, info=None, rate_limit=0,
+                 checksum=None, auto=False, mirrors=(), cache=None):
         super().__init__()
-        self.row = row
-        self.url = url
-        self.save_path = save_path
-        self.num_threads = threads
-        self._pause = False
-        self._cancel = False
-        self._lock = threading.Lock()
-        self._downloaded = 0
-
-    def pause(self):  self._pause = True
-    def resume(self): self._pause = False
-    def cancel(self): self._cancel = True; self._pause = False
+        self.did = did
+        self._dl = Downloader(
+            url, save_path, threads, preallocate, info,
+            on_progress=lambda *a: self.progress.emit(self.did, *a),
+            on_finished=lambda ok, msg, status: self.finished.emit(self.did, ok, msg, status),
+            on_status=lambda st: self.status_changed.emit(self.did, st),
+            rate_limit=rate_limit, checksum=checksum, auto=auto, mirrors=mirrors, cache=cache)
+
+    def pause(self):  self._dl.pause()
+    def resume(self): self._dl.resume()
+    def cancel(self): self._dl.cancel()
+    def set_rate_limit(self, rate): self._dl.set_rate_limit(rate)
+
+    @property
+    def telemetry(self): return self._dl.telemetry
 
     def run(self):
-        try:
-            self._download()
-        except Exception as e:
-            self.finished.emit(self.row, False, str(e))
-
-    def _download(self):
-        try:
-            head = requests.head(self.url, allow_redirects=True, timeout=15)
-            total = int(head.headers.get('content-length', 0))
-            supports_range = 'bytes' in head.headers.get('accept-ranges', '')
-        except Exception:
-            total, supports_range = 0, False
-
-        self.status_changed.emit(self.row, "מוריד")
+        self._dl.run()
 
-        if supports_range and total > 0 and self.num_threads > 1:
-            self._multi(total)
-        else:
-            self._single(total)
 
-    def _single(self, total):
-        try:
-            resp = requests.get(self.url, stream=True, timeout=30)
-            resp.raise_for_status()
-            if not total:
-                total = int(resp.headers.get('content-length', 0))
-            downloaded, last_bytes, last_t = 0, 0, time.time()
-            with open(self.save_path, 'wb') as f:
-                for chunk in resp.iter_content(65536):
-                    if self._cancel:
-                        self.finished.emit(self.row, False, "בוטל"); return
-                    while self._pause: time.sleep(0.1)
-                    if chunk:
-                        f.write(chunk)
-                        downloaded += len(chunk)
-                        now = time.time()
-                        if now - last_t >= 0.5:
-                            speed = (downloaded - last_bytes) / (now - last_t)
-                            eta = (total - downloaded) / speed if speed > 0 and total else 0
-                            self.progress.emit(self.row, downloaded, total, speed, eta)
-                            last_t, last_bytes = now, downloaded
-            self.finished.emit(self.row, True, "הושלם")
-        except Exception as e:
-            self.finished.emit(self.row, False, str(e))
-
-    def _multi(self, total):
-        chunk = math.ceil(total / self.num_threads)
-        ranges = [(i * chunk, min((i+1)*chunk - 1, total-1)) for i in range(self.num_threads)]
-        temps = [f"{self.save_path}.part{i}" for i in range(len(ranges))]
-        errors = []
-        self._downloaded = 0
-
-        def dl_chunk(s, e, path):
-            try:
-                r = requests.get(self.url, headers={'Range': f'bytes={s}-{e}'}, stream=True, timeout=60)
-                r.raise_for_status()
-                with open(path, 'wb') as f:
-                    for ch in r.iter_content(65536):
-                        if self._cancel: return
-                        while self._pause: time.sleep(0.1)
-                        if ch:
-                            f.write(ch)
-                            with self._lock: self._downloaded += len(ch)
-            except Exception as ex:
-                errors.append(str(ex))
-
-        threads = [threading.Thread(target=dl_chunk, args=(s, e, t), daemon=True)
-                   for (s, e), t in zip(ranges, temps)]
-        for t in threads: t.start()
-
-        last_bytes, last_t = 0, time.time()
-        while any(t.is_alive() for t in threads):
-            if self._cancel:
-                for t in threads: t.join(0.1)
-                self.finished.emit(self.row, False, "בוטל"); return
-            now = time.time()
-            if now - last_t >= 0.5:
-                curr = self._downloaded
-                speed = (curr - last_bytes) / (now - last_t)
-                eta = (total - curr) / speed if speed > 0 else 0
-                self.progress.emit(self.row, curr, total, speed, eta)
-                last_t, last_bytes = now, curr
-            time.sleep(0.2)
-
-        if errors:
-            self.finished.emit(self.row, False, errors[0]); return
+class AsyncDownloadWorker(QObject):
+    """מתאם Qt ל-AsyncDownload - אותם סיגנלים ואותו ממשק כמו DownloadWorker"""
+    progress       = pyqtSignal(int, int, int, float, float)
+    finished       = pyqtSignal(int, bool, str, str)  # id, ok, msg, status
+    status_changed = pyqtSignal(int, str)
 
+    def __init__(self, did, url, save_path, threads=8, preallocate=True, info=None, rate_limit=0,
+                 checksum=None, auto=False, mirrors=(), cache=None):
+        super().__init__()
+        self.did = did
+        self._future = None
+        self._dl = AsyncDownload(
+            AsyncEngine.shared(), url, save_path, threads, preallocate, info,
+            on_progress=lambda *a: self.progress.emit(self.did, *a),
+            on_finished=lambda ok, msg, status: self.finished.emit(self.did, ok, msg, status),
+            on_status=lambda st: self.status_changed.emit(self.did, st),
+            rate_limit=rate_limit, checksum=checksum, auto=auto, mirrors=mirrors, cache=cache)
+
+    def start(self):  self._future = self._dl.engine.submit(self._dl.run())
+    def pause(self):  self._dl.pause()
+    def resume(self): self._dl.resume()
+    def cancel(self): self._dl.cancel()
+    def set_rate_limit(self, rate): self._dl.set_rate_limit(rate)
+
+    @property
+    def telemetry(self): return self._dl.telemetry
+
+    def isRunning(self):
+        return self._future is not None and not self._future.done()
+
+    def wait(self, ms=None):
+        if self._future is None: return True
         try:
-            with open(self.save_path, 'wb') as out:
-                for p in temps:
-                    with open(p, 'rb') as f: out.write(f.read())
-                    os.remove(p)
-            self.finished.emit(self.row, True, "הושלם")
-        except Exception as e:
-            self.finished.emit(self.row, False, f"שגיאת מיזוג: {e}")
-
+            self._future.result(None if ms is None else ms / 1000)
+        except Exception:
+            pass
+        return self._future.done()
 
 # ─── Add Download Dialog ──────────────────────────────────────────────────────
 
@@ -356,6 +288,12 @@ class AddDownloadDialog(QDialog):
         self.url_input.setMinimumHeight(42)
         layout.addWidget(self.url_input)
 
+        layout.addWidget(self._section("מראות (כתובות נוספות לאותו קובץ, מופרדות ברווח)"))
+        self.mirrors_input = QLineEdit()
+        self.mirrors_input.setPlaceholderText("אופציונלי")
+        self.mirrors_input.setMinimumHeight(42)
+        layout.addWidget(self.mirrors_input)
+
         layout.addWidget(self._section("תיקיית שמירה"))
         row = QHBoxLayout()
         self.path_input = QLineEdit(self.save_dir)
@@ -368,11 +306,25 @@ class AddDownloadDialog(QDialog):
         row.addWidget(browse)
         layout.addLayout(row)
 
-        layout.addWidget(self._section("מספר חוטים (1-16)"))
+        layout.addWidget(self._section("מספר חוטים (1-16, או 0 / auto לכיוונון אוטומטי)"))
         self.thread_input = QLineEdit("8")
         self.thread_input.setMinimumHeight(42)
         layout.addWidget(self.thread_input)
 
+        layout.addWidget(self._section("הגבלת מהירות (למשל 500K, 2M; 0 = ללא)"))
+        self.limit_input = QLineEdit("0")
+        self.limit_input.setMinimumHeight(42)
+        layout.addWidget(self.limit_input)
+
+        layout.addWidget(self._section("Checksum (sha256:..., md5:... או כתובת לקובץ .sha256)"))
+        self.checksum_input = QLineEdit()
+        self.checksum_input.setPlaceholderText("אופציונלי")
+        self.checksum_input.setMinimumHeight(42)
+        layout.addWidget(self.checksum_input)
+
+        self.cache_check = QCheckBox("מטמון: לדלג אם הקובץ לא השתנה בשרת, ולאחד קבצים זהים")
+        layout.addWidget(self.cache_check)
+
         layout.addSpacing(8)
         btns = QHBoxLayout()
         cancel = QPushButton("ביטול")
@@ -402,35 +354,231 @@ class AddDownloadDialog(QDialog):
         self.accept()
 
     def get_data(self):
-        try: t = max(1, min(16, int(self.thread_input.text())))
-        except: t = 8
+        text = self.thread_input.text().strip().lower()
+        try: t = 0 if text in ("auto", "אוטו") else max(0, min(16, int(text)))
+        except ValueError: t = 8
+        try: limit = parse_rate(self.limit_input.text())
+        except ValueError: limit = 0
         return {"url": self.url_input.text().strip(),
                 "save_dir": self.path_input.text().strip(),
-                "threads": t}
+                "threads": t, "limit": limit,
+                "checksum": self.checksum_input.text().strip() or None,
+                "mirrors": self.mirrors_input.text().split(),
+                "cache": self.cache_check.isChecked()}
 
 
-# ─── Main Window ──────────────────────────────────────────────────────────────
+# ─── Download Table Model ─────────────────────────────────────────────────────
 
-class PyDownWindow(QMainWindow):
-    STATUS_ICONS  = {"ממתין":"⏳","מוריד":"⬇","מושהה":"⏸","הושלם":"✅","שגיאה":"❌","בוטל":"🚫"}
+class DownloadTableModel(QAbstractTableModel):
+    """מודל מעל self.downloads - עדכונים נצברים ונשלחים כ-dataChanged רק לתאים שהשתנו, בקצב קבוע.
+    כל הורדה מזוהה ב-id יציב; השורה נמצאת דרך אינדקס id -> שורה ולא נשמרת אצל ה-workers"""
+    STATUS_ICONS  = {"ממתין":"⏳","מוריד":"⬇","מושהה":"⏸","הושלם":"✅","שגיאה":"❌","בוטל":"🚫",
+                     "מאמת":"🔍","אומת":"🛡","פגום":"⚠"}
     STATUS_COLORS = {"מוריד":COLORS["accent"],"הושלם":COLORS["success"],
                      "שגיאה":COLORS["danger"],"בוטל":COLORS["danger"],
-                     "מושהה":COLORS["warning"],"ממתין":COLORS["text_muted"]}
-
+                     "מושהה":COLORS["warning"],"ממתין":COLORS["text_muted"],
+                     "מאמת":COLORS["accent"],"אומת":COLORS["success"],"פגום":COLORS["danger"]}
+    HEADERS = ["שם קובץ", "גודל", "התקדמות", "מהירות", "ETA", "סטטוס", "חוטים"]
     C_NAME, C_SIZE, C_PROG, C_SPEED, C_ETA, C_STATUS, C_THREADS = range(7)
+    FIELD_COLS = {"filename": (C_NAME,), "downloaded": (C_SIZE, C_PROG), "total": (C_SIZE, C_PROG),
+                  "speed": (C_SPEED,), "eta": (C_ETA,), "status": (C_STATUS,), "threads": (C_THREADS,)}
+    FPS = 10
+    SORT_ROLE = Qt.ItemDataRole.UserRole + 1
+
+    def __init__(self, downloads, parent=None):
+        super().__init__(parent)
+        self.downloads = downloads
+        self._rows = {}   # id -> שורה
+        self._dirty = {}  # id -> (min col, max col)
+        self._fonts = {w: QFont("Segoe UI", 11, w) for w in (QFont.Weight.Normal, QFont.Weight.Bold)}
+        self._colors = {k: QColor(v) for k, v in self.STATUS_COLORS.items()}
+        self._timer = QTimer(self)
+        self._timer.timeout.connect(self._flush)
+        self._timer.start(1000 // self.FPS)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.downloads)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if orientation == Qt.Orientation.Horizontal and role == Qt.ItemDataRole.DisplayRole:
+            return self.HEADERS[section]
+        return None
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        m, col = self.downloads[index.row()], index.column()
+        if role == Qt.ItemDataRole.DisplayRole:
+            if col == self.C_NAME:    return m["filename"]
+            if col == self.C_SIZE:
+                if not m["downloaded"] and not m["total"]: return "—"
+                return f"{format_size(m['downloaded'])} / {format_size(m['total'])}" if m["total"] else format_size(m["downloaded"])
+            if col == self.C_SPEED:   return format_speed(m["speed"])
+            if col == self.C_ETA:     return format_eta(m["eta"])
+            if col == self.C_STATUS:  return f"{self.STATUS_ICONS.get(m['status'], '')}  {m['status']}"
+            if col == self.C_THREADS: return str(m["threads"]) if m["threads"] else "אוטו"
+        elif role == Qt.ItemDataRole.UserRole and col == self.C_PROG:
+            return m["downloaded"] / m["total"] if m["total"] else 0.0
+        elif role == self.SORT_ROLE:
+            if col == self.C_NAME:   return m["filename"].lower()
+            if col == self.C_SIZE:   return m["total"] or m["downloaded"]
+            if col == self.C_PROG:   return m["downloaded"] / m["total"] if m["total"] else 0.0
+            if col == self.C_SPEED:  return m["speed"]
+            if col == self.C_ETA:    return m["eta"]
+            if col == self.C_STATUS: return m["status"]
+            return m["threads"]
+        elif role == Qt.ItemDataRole.ToolTipRole and col == self.C_NAME:
+            return "\n".join([m["url"], *m["mirrors"]])
+        elif col == self.C_STATUS:
+            if role == Qt.ItemDataRole.ForegroundRole:
+                return self._colors.get(m["status"])
+            if role == Qt.ItemDataRole.FontRole:
+                bold = m["status"] in ("מוריד", "הושלם", "אומת")
+                return self._fonts[QFont.Weight.Bold if bold else QFont.Weight.Normal]
+        return None
+
+    def append(self, meta):
+        row = len(self.downloads)
+        self.beginInsertRows(QModelIndex(), row, row)
+        self.downloads.append(meta)
+        self._rows[meta["id"]] = row
+        self.endInsertRows()
+
+    def meta(self, did):
+        row = self._rows.get(did)
+        return None if row is None else self.downloads[row]
+
+    def id_at(self, row):
+        return self.downloads[row]["id"]
+
+    def remove_ids(self, ids):
+        """מוחק קבוצת הורדות בבת אחת - בלוקים רציפים מהסוף להתחלה, ואינדקס השורות נבנה מחדש פעם אחת"""
+        rows = sorted((self._rows[d] for d in ids if d in self._rows), reverse=True)
+        while rows:
+            hi = lo = rows.pop(0)
+            while rows and rows[0] == lo - 1: lo = rows.pop(0)
+            self.beginRemoveRows(QModelIndex(), lo, hi)
+            del self.downloads[lo:hi + 1]
+            self.endRemoveRows()
+        for d in ids:
+            self._rows.pop(d, None); self._dirty.pop(d, None)
+        self._rows = {m["id"]: r for r, m in enumerate(self.downloads)}
+
+    def update(self, did, **fields):
+        """מעדכן שדות ומסמן לצביעה רק את העמודות שהערך שלהן באמת השתנה"""
+        m = self.meta(did)
+        if m is None: return
+        for k, v in fields.items():
+            if m.get(k) == v: continue
+            m[k] = v
+            for col in self.FIELD_COLS.get(k, ()):
+                lo, hi = self._dirty.get(did, (col, col))
+                self._dirty[did] = (min(lo, col), max(hi, col))
+
+    def _flush(self):
+        dirty, self._dirty = self._dirty, {}
+        for did, (lo, hi) in dirty.items():
+            row = self._rows.get(did)
+            if row is not None:
+                self.dataChanged.emit(self.index(row, lo), self.index(row, hi))
+
+
+class ProgressDelegate(QStyledItemDelegate):
+    """פס התקדמות מצויר - במקום QProgressBar חי בכל שורה"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._bg, self._fg = QColor(COLORS["progress_bg"]), QColor(COLORS["accent"])
+
+    def paint(self, painter, option, index):
+        frac = index.data(Qt.ItemDataRole.UserRole) or 0.0
+        r = QRectF(option.rect).adjusted(12, 0, -12, 0)
+        r = QRectF(r.x(), r.center().y() - 3, r.width(), 6)
+        painter.save()
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        painter.setPen(Qt.PenStyle.NoPen)
+        painter.setBrush(self._bg); painter.drawRoundedRect(r, 3, 3)
+        if frac > 0:
+            painter.setBrush(self._fg)
+            painter.drawRoundedRect(QRectF(r.x(), r.y(), r.width() * min(frac, 1.0), r.height()), 3, 3)
+        painter.restore()
+
+
+# ─── History Dialog ───────────────────────────────────────────────────────────
+
+class HistoryDialog(QDialog):
+    HEADERS = ["שם קובץ", "גודל", "ממוצע", "שיא", "משך", "סטטוס", "תאריך"]
+
+    def __init__(self, history, parent=None):
+        super().__init__(parent)
+        self.history = history
+        self.setWindowTitle("היסטוריית הורדות")
+        self.resize(900, 520)
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(20, 18, 20, 18)
+        self.search = QLineEdit()
+        self.search.setPlaceholderText("🔍  חיפוש לפי שם או כתובת")
+        self.search.setMinimumHeight(40)
+        layout.addWidget(self.search)
+        self.table = QTableWidget(0, len(self.HEADERS))
+        self.table.setHorizontalHeaderLabels(self.HEADERS)
+        self.table.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeMode.Stretch)
+        self.table.verticalHeader().setVisible(False)
+        self.table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        layout.addWidget(self.table)
+        self._debounce = QTimer(self)
+        self._debounce.setSingleShot(True)
+        self._debounce.timeout.connect(self._refresh)
+        self.search.textChanged.connect(lambda: self._debounce.start(150))
+        self._refresh()
+
+    def _refresh(self):
+        rows = self.history.search(self.search.text())
+        self.table.setRowCount(len(rows))
+        for i, r in enumerate(rows):
+            dur = r["duration"] or 0
+            for col, val in enumerate([
+                    r["filename"], format_size(r["size"]), format_speed(r["avg_speed"] or 0),
+                    format_speed(r["peak_speed"] or 0), format_eta(dur) if dur >= 1 else "—",
+                    r["status"], datetime.fromtimestamp(r["added"]).strftime("%d/%m/%Y %H:%M")]):
+                item = QTableWidgetItem(val)
+                if col == 0: item.setToolTip(f"{r['url']}\n{r['save_path']}")
+                self.table.setItem(i, col, item)
+
+
+# ─── Main Window ──────────────────────────────────────────────────────────────
 
+class PyDownWindow(QMainWindow):
     def __init__(self):
         super().__init__()
         self.setWindowTitle("PyDown — מנהל הורדות מקצועי")
         self.resize(1060, 660)
         self.setMinimumSize(800, 500)
         self.downloads = []
-        self.workers   = {}
+        self.model     = DownloadTableModel(self.downloads, self)
+        self.proxy     = QSortFilterProxyModel(self)
+        self.proxy.setSourceModel(self.model)
+        self.proxy.setSortRole(DownloadTableModel.SORT_ROLE)
+        self.proxy.setFilterKeyColumn(DownloadTableModel.C_NAME)
+        self.proxy.setFilterCaseSensitivity(Qt.CaseSensitivity.CaseInsensitive)
+        self.workers   = {}  # id -> worker
+        self._retired  = {}  # workers שנמחקו ועוד לא סיימו - נשמרים עד שהחוט נגמר
+        self.queue     = DownloadQueue()
+        SESSIONS.configure(self.queue.pool_size())
+        self.history   = DownloadHistory()
+        self.cache     = DownloadCache()
+        self._closing  = False
         self.save_dir  = str(Path.home() / "Downloads")
         self._build()
+        self._restore_unfinished()
         self._timer = QTimer()
         self._timer.timeout.connect(self._refresh_stats)
         self._timer.start(1000)
+        # PYDOWN_METRICS_PORT=<port> פותח נקודת מדדים מקומית (JSON ב-/, Prometheus ב-/metrics)
+        port = os.environ.get("PYDOWN_METRICS_PORT")
+        self.metrics = MetricsServer(int(port), self._metrics) if port else None
 
     def _build(self):
         self.setStyleSheet(STYLESHEET)
@@ -446,9 +594,13 @@ class PyDownWindow(QMainWindow):
             (None, None, None),
             ("▶  המשך",   None, self._resume_selected),
             ("⏸  השהה",   None, self._pause_selected),
+            ("⏫  קדם",    None, self._prioritize_selected),
             (None, None, None),
             ("🗑  מחק",    "Del", self._delete_selected),
             (None, None, None),
+            ("🕘  היסטוריה", "Ctrl+H", self._show_history),
+            ("🚦  מהירות", None, self._set_speed_limit),
+            ("🐢  מגבלה לנבחרות", None, self._limit_selected),
             ("📁  תיקייה", None, self._change_folder),
         ]:
             if label is None:
@@ -475,18 +627,26 @@ class PyDownWindow(QMainWindow):
         sub.setStyleSheet(f"color:{COLORS['text_muted']}; font-size:12px;")
         self.speed_lbl = QLabel("")
         self.speed_lbl.setStyleSheet(f"color:{COLORS['accent']}; font-size:14px; font-weight:700;")
-        hl.addWidget(logo); hl.addWidget(sub); hl.addStretch(); hl.addWidget(self.speed_lbl)
+        self.filter_input = QLineEdit()
+        self.filter_input.setPlaceholderText("🔍  סינון לפי שם")
+        self.filter_input.setFixedWidth(220)
+        self.filter_input.textChanged.connect(self.proxy.setFilterFixedString)
+        hl.addWidget(logo); hl.addWidget(sub); hl.addStretch(); hl.addWidget(self.filter_input); hl.addWidget(self.speed_lbl)
         layout.addWidget(hcard)
 
         # Table
-        self.table = QTableWidget(0, 7)
-        self.table.setHorizontalHeaderLabels(["שם קובץ", "גודל", "התקדמות", "מהירות", "ETA", "סטטוס", "חוטים"])
+        self.table = QTableView()
+        self.table.setModel(self.proxy)
+        self.table.setSortingEnabled(True)
+        self.table.sortByColumn(-1, Qt.SortOrder.AscendingOrder)
+        self.table.setItemDelegateForColumn(DownloadTableModel.C_PROG, ProgressDelegate(self.table))
         h = self.table.horizontalHeader()
         h.setSectionResizeMode(0, QHeaderView.ResizeMode.Stretch)
         for col, w in [(1,100),(2,200),(3,110),(4,80),(5,100),(6,65)]:
             h.setSectionResizeMode(col, QHeaderView.ResizeMode.Fixed)
             self.table.setColumnWidth(col, w)
         self.table.verticalHeader().setVisible(False)
+        self.table.verticalHeader().setDefaultSectionSize(52)
         self.table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
         self.table.setAlternatingRowColors(True)
         self.table.setShowGrid(False)
@@ -505,136 +665,186 @@ class PyDownWindow(QMainWindow):
         dlg = AddDownloadDialog(self, self.save_dir)
         if dlg.exec() != QDialog.DialogCode.Accepted: return
         d = dlg.get_data()
-        self._start(d["url"], d["save_dir"], d["threads"])
+        self._start(d["url"], d["save_dir"], d["threads"], limit=d["limit"], checksum=d["checksum"],
+                    mirrors=d["mirrors"], cache=d["cache"])
 
-    def _start(self, url, save_dir, threads=8):
+    def _start(self, url, save_dir, threads=8, priority=0, limit=0, checksum=None, mirrors=(), cache=False):
         os.makedirs(save_dir, exist_ok=True)
-        try:
-            head = requests.head(url, allow_redirects=True, timeout=10)
-            fname = get_filename(url, head.headers)
-        except Exception:
-            fname = get_filename(url)
-
-        save_path = os.path.join(save_dir, fname)
-        base, ext = os.path.splitext(save_path)
-        c = 1
-        while os.path.exists(save_path):
-            save_path = f"{base}_{c}{ext}"; c += 1
-
-        row = self.table.rowCount()
-        self.table.insertRow(row)
-        self.table.setRowHeight(row, 52)
-
-        self.downloads.append({
-            "url": url, "filename": os.path.basename(save_path),
+        info = probe(url, timeout=10)
+        taken = {d["save_path"] for d in self.downloads}
+        # סנכרון חוזר של כתובת מהמטמון נכתב לאותו שם, לא ל-file_1.ext
+        cached = cache and self.cache.path_for(url, save_dir)
+        save_path = cached if cached and cached not in taken else unique_path(save_dir, info["filename"], url, taken)
+
+        fname = os.path.basename(save_path)
+        did = self.history.add(url, fname, save_path, threads, limit, checksum, mirrors=mirrors, cache=cache)
+        meta = self._new_meta(did, url, save_path, threads, limit, checksum, info, mirrors, cache)
+        self._enqueue(meta, priority)
+        self.sb.showMessage(f"נוסף לתור: {fname}")
+
+    def _new_meta(self, did, url, save_path, threads, limit=0, checksum=None, info=None, mirrors=(), cache=False):
+        return {
+            "id": did, "url": url, "filename": os.path.basename(save_path),
             "save_path": save_path, "total": 0, "downloaded": 0,
-            "speed": 0, "eta": 0, "status": "ממתין", "threads": threads
-        })
-
-        for col, val in [(self.C_NAME, os.path.basename(save_path)),
-                         (self.C_SIZE, "—"), (self.C_SPEED, "—"),
-                         (self.C_ETA, "—"), (self.C_THREADS, str(threads))]:
-            item = QTableWidgetItem(val)
-            if col == self.C_NAME: item.setToolTip(url)
-            self.table.setItem(row, col, item)
-        self._set_status(row, "ממתין")
-
-        pb = QProgressBar()
-        pb.setRange(0, 100); pb.setValue(0)
-        pb.setTextVisible(False); pb.setFixedHeight(6)
-        self.table.setCellWidget(row, self.C_PROG, pb)
-
-        w = DownloadWorker(row, url, save_path, threads)
-        w.progress.connect(self._on_progress)
-        w.finished.connect(self._on_finished)
-        w.status_changed.connect(self._on_status_changed)
-        self.workers[row] = w
-        w.start()
-        self.sb.showMessage(f"הורדה החלה: {os.path.basename(save_path)}")
+            "speed": 0, "eta": 0, "status": "ממתין", "threads": threads,
+            "limit": limit, "checksum": checksum, "info": info, "mirrors": list(mirrors), "cache": cache,
+            "started": None, "base": None, "peak": 0.0
+        }
+
+    def _enqueue(self, meta, priority=0):
+        self.model.append(meta)
+        self.queue.add(meta, meta["url"], self._connections(meta), priority)
+        self._pump_queue()
+
+    @staticmethod
+    def _connections(meta):
+        return queue_connections(meta.get("info"), meta["threads"])
+
+    def _restore_unfinished(self):
+        """הורדות שלא הסתיימו בהפעלה הקודמת חוזרות לתור וממשיכות מהיומן; מושהות נשארות מושהות עד 'המשך'"""
+        rows = self.history.unfinished()
+        for r in rows:
+            meta = self._new_meta(r["id"], r["url"], r["save_path"], r["threads"], r["rate_limit"], r["checksum"],
+                                  mirrors=(r["mirrors"] or "").split(), cache=bool(r["cache"]))
+            paused = r["status"] == "מושהה"
+            if paused: meta["status"] = "מושהה"
+            self.model.append(meta)
+            if paused: continue
+            self.history.update(r["id"], status="ממתין")
+            self.queue.add(meta, r["url"], self._connections(meta))
+        if rows:
+            self.sb.showMessage(f"{len(rows)} הורדות שלא הסתיימו הוחזרו לתור")
+            self._pump_queue()
+
+    def _pump_queue(self):
+        if self._closing: return  # ה-finished של workers שבוטלו בסגירה לא מתחיל את הבאים בתור
+        for meta, threads in self.queue.take():
+            did = meta["id"]
+            cls = AsyncDownloadWorker if ENGINE == "async" else DownloadWorker
+            info = meta.pop("info", None)
+            auto = not meta["threads"]
+            w = cls(did, meta["url"], meta["save_path"], threads,
+                    info=info, rate_limit=meta["limit"], checksum=meta["checksum"], auto=auto,
+                    mirrors=meta["mirrors"], cache=self.cache if meta["cache"] else None)
+            w.progress.connect(self._on_progress)
+            w.finished.connect(self._on_finished)
+            w.status_changed.connect(self._on_status_changed)
+            self.workers[did] = w
+            fields = {"total": info["total"]} if info else {}
+            if not auto: fields["threads"] = threads
+            self.model.update(did, **fields)
+            meta.update(started=time.time(), base=None, peak=0.0)
+            self.history.update(did, status="מוריד", started=meta["started"])
+            w.start()
 
     # ── Signals ───────────────────────────────────────────────────────────────
 
-    def _on_progress(self, row, dl, total, speed, eta):
-        if row >= len(self.downloads): return
-        m = self.downloads[row]
-        m["downloaded"], m["total"], m["speed"], m["eta"] = dl, total, speed, eta
-        pct = int(dl / total * 100) if total else 0
-        pb = self.table.cellWidget(row, self.C_PROG)
-        if pb: pb.setValue(pct)
-        size_str = f"{format_size(dl)} / {format_size(total)}" if total else format_size(dl)
-        self.table.setItem(row, self.C_SIZE,  QTableWidgetItem(size_str))
-        self.table.setItem(row, self.C_SPEED, QTableWidgetItem(format_speed(speed)))
-        self.table.setItem(row, self.C_ETA,   QTableWidgetItem(format_eta(eta)))
-
-    def _on_finished(self, row, ok, msg):
-        if row >= len(self.downloads): return
-        status = "הושלם" if ok else ("בוטל" if msg == "בוטל" else "שגיאה")
-        self.downloads[row]["status"] = status
-        self._set_status(row, status)
-        pb = self.table.cellWidget(row, self.C_PROG)
-        if pb and ok: pb.setValue(100)
-        self.table.setItem(row, self.C_SPEED, QTableWidgetItem("—"))
-        self.table.setItem(row, self.C_ETA,   QTableWidgetItem("—"))
-        fname = self.downloads[row]["filename"]
-        self.sb.showMessage(f"{'✅ הושלם' if ok else '❌ שגיאה'}: {fname}" + ("" if ok else f" — {msg}"))
-
-    def _on_status_changed(self, row, status):
-        if row < len(self.downloads): self.downloads[row]["status"] = status
-        self._set_status(row, status)
-
-    def _set_status(self, row, status):
-        icon  = self.STATUS_ICONS.get(status, "")
-        color = self.STATUS_COLORS.get(status, COLORS["text_primary"])
-        item = QTableWidgetItem(f"{icon}  {status}")
-        item.setForeground(QColor(color))
-        bold = status in ("מוריד", "הושלם")
-        item.setFont(QFont("Segoe UI", 11, QFont.Weight.Bold if bold else QFont.Weight.Normal))
-        self.table.setItem(row, self.C_STATUS, item)
+    def _on_progress(self, did, dl, total, speed, eta):
+        m = self.model.meta(did)
+        if m is None: return
+        if m["base"] is None: m["base"] = max(0, dl - int(speed * 0.5))
+        m["peak"] = max(m["peak"], speed)
+        self.model.update(did, downloaded=dl, total=total, speed=speed, eta=eta)
+
+    def _on_finished(self, did, ok, msg, status):
+        self._retired.pop(did, None)
+        m = self.model.meta(did)
+        if m is None: return
+        self.queue.release(m)
+        QTimer.singleShot(0, self._pump_queue)
+        self.model.update(did, status=status, speed=0, eta=0,
+                          **({"downloaded": m["total"]} if ok and m["total"] else {}))
+        if not self._closing:
+            self.history.finish(did, status, msg, m["downloaded"], m["started"], m["base"] or 0, m["peak"])
+        self.sb.showMessage(f"{'✅ ' + msg if ok else '❌ שגיאה'}: {m['filename']}" + ("" if ok else f" — {msg}"))
+
+    def _on_status_changed(self, did, status):
+        if self.model.meta(did) is None: return
+        self.model.update(did, status=status)
+        self.history.update(did, status=status)
 
     # ── Toolbar Actions ───────────────────────────────────────────────────────
 
-    def _selected_rows(self):
-        return list({i.row() for i in self.table.selectedIndexes()})
+    def _selected_ids(self):
+        return [self.model.id_at(self.proxy.mapToSource(i).row())
+                for i in self.table.selectionModel().selectedRows()]
 
     def _pause_selected(self):
-        for row in self._selected_rows():
-            w = self.workers.get(row)
+        for did in self._selected_ids():
+            w = self.workers.get(did)
             if w and w.isRunning():
-                w.pause(); self._on_status_changed(row, "מושהה")
+                w.pause(); self._on_status_changed(did, "מושהה")
 
     def _resume_selected(self):
-        for row in self._selected_rows():
-            meta = self.downloads[row]
-            w = self.workers.get(row)
+        for did in self._selected_ids():
+            meta = self.model.meta(did)
+            w = self.workers.get(did)
             if w and w.isRunning():
-                w.resume(); self._on_status_changed(row, "מוריד")
-            elif meta["status"] in ("שגיאה", "בוטל", "מושהה"):
+                w.resume(); self._on_status_changed(did, "מוריד")
+            elif meta["status"] in ("שגיאה", "בוטל", "מושהה", "פגום"):
                 if w: w.cancel()
-                nw = DownloadWorker(row, meta["url"], meta["save_path"], meta["threads"])
-                nw.progress.connect(self._on_progress)
-                nw.finished.connect(self._on_finished)
-                nw.status_changed.connect(self._on_status_changed)
-                self.workers[row] = nw
-                nw.start()
-                pb = self.table.cellWidget(row, self.C_PROG)
-                if pb: pb.setValue(0)
+                self._on_status_changed(did, "ממתין")
+                self.queue.add(meta, meta["url"], self._connections(meta))
+        self._pump_queue()
+
+    def _prioritize_selected(self):
+        for did in self._selected_ids():
+            meta = self.model.meta(did)
+            self.queue.set_priority(meta, self.queue.priority(meta) + 1)
+        self._pump_queue()
 
     def _delete_selected(self):
-        rows = sorted(self._selected_rows(), reverse=True)
-        if not rows: return
-        if QMessageBox.question(self, "מחיקה", f"למחוק {len(rows)} הורדה/ות?",
+        ids = self._selected_ids()
+        if not ids: return
+        if QMessageBox.question(self, "מחיקה", f"למחוק {len(ids)} הורדה/ות?",
                 QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No) != QMessageBox.StandardButton.Yes:
             return
-        for row in rows:
-            w = self.workers.pop(row, None)
-            if w: w.cancel(); w.wait(300)
-            self.table.removeRow(row)
-            if row < len(self.downloads): self.downloads.pop(row)
-            nw = {}
-            for r, wk in self.workers.items():
-                nr = r if r < row else r - 1
-                wk.row = nr; nw[nr] = wk
-            self.workers = nw
+        for did in ids:
+            w = self.workers.pop(did, None)
+            if w:
+                w.cancel(); self._retired[did] = w
+            meta = self.model.meta(did)
+            self.queue.remove(meta)
+            if meta["status"] in DownloadHistory.RESUMABLE:
+                self.history.update(did, status="בוטל", message="נמחק")
+        self.model.remove_ids(ids)
+        self._pump_queue()
+
+    def _show_history(self):
+        HistoryDialog(self.history, self).exec()
+
+    def _set_speed_limit(self):
+        cur = format_speed(LIMITER.base_rate) if LIMITER.base_rate else "0"
+        text, ok = QInputDialog.getText(self, "הגבלת מהירות",
+            "מגבלה גלובלית (למשל 2M, 0 = ללא), ואחרי | לוח זמנים אופציונלי (למשל 0-7:0,7-24:500K):",
+            text=cur.replace(" ", "").replace("/s", ""))
+        if not ok: return
+        rate, _, sched = text.partition("|")
+        try:
+            LIMITER.configure(parse_rate(rate or 0), parse_schedule(sched))
+        except ValueError:
+            QMessageBox.warning(self, "שגיאה", "פורמט מגבלה לא תקין"); return
+        self.sb.showMessage(f"מגבלת מהירות: {format_speed(LIMITER.current_rate()) if LIMITER.current_rate() else 'ללא'}")
+
+    def _limit_selected(self):
+        """מגבלה לכל הורדה נבחרת בנפרד - חלה מיד על מה שרץ, ונשמרת בהיסטוריה להמשך"""
+        ids = self._selected_ids()
+        if not ids: return
+        cur = self.model.meta(ids[0])["limit"]
+        text, ok = QInputDialog.getText(self, "מגבלה לנבחרות",
+            f"מגבלת מהירות ל-{len(ids)} הורדות נבחרות (למשל 500K, 0 = ללא):",
+            text=format_speed(cur).replace(" ", "").replace("/s", "") if cur else "0")
+        if not ok: return
+        try:
+            rate = parse_rate(text or 0)
+        except ValueError:
+            QMessageBox.warning(self, "שגיאה", "פורמט מגבלה לא תקין"); return
+        for did in ids:
+            self.model.update(did, limit=rate)
+            self.history.update(did, rate_limit=rate)
+            w = self.workers.get(did)
+            if w and w.isRunning(): w.set_rate_limit(rate)
+        self.sb.showMessage(f"מגבלה ל-{len(ids)} הורדות: {format_speed(rate) if rate else 'ללא'}")
 
     def _change_folder(self):
         f = QFileDialog.getExistingDirectory(self, "בחר תיקייה", self.save_dir)
@@ -644,10 +854,20 @@ class PyDownWindow(QMainWindow):
 
     # ── Stats ─────────────────────────────────────────────────────────────────
 
+    def _metrics(self):
+        """נקרא מחוט השרת - רק קריאות, על עותק של רשימת ה-workers"""
+        out = {}
+        for did, w in list(self.workers.items()):
+            meta = self.model.meta(did)
+            if meta and w.isRunning():
+                out[str(did)] = {"url": meta["url"], "path": meta["save_path"], **w.telemetry.snapshot()}
+        return out
+
     def _refresh_stats(self):
         active = [d for d in self.downloads if d["status"] == "מוריד"]
-        total_speed = sum(d["speed"] for d in active)
-        done = sum(1 for d in self.downloads if d["status"] == "הושלם")
+        # הקצב המוחלק של כל הורדה, ולא הדגימה האחרונה שלה
+        total_speed = sum(self.workers[d["id"]].telemetry.ewma for d in active if d["id"] in self.workers)
+        done = sum(1 for d in self.downloads if d["status"] in ("הושלם", "אומת"))
         if total_speed > 0:
             self.speed_lbl.setText(f"⬇ {format_speed(total_speed)}")
         else:
@@ -661,6 +881,8 @@ class PyDownWindow(QMainWindow):
             if QMessageBox.question(self, "יציאה", f"יש {len(active)} הורדות פעילות. לצאת?",
                     QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No) != QMessageBox.StandardButton.Yes:
                 e.ignore(); return
+        # מה שעוד רץ נשאר "מוריד" בהיסטוריה כדי לחזור לתור בהפעלה הבאה
+        self._closing = True
         for w in self.workers.values(): w.cancel()
         e.accept()
 
@@ -0,0 +1,386 @@
+#!/usr/bin/env python3
+"""
+PyDown Bench - מדידת תפוקה של מנוע ההורדה מול שרת HTTP מקומי
+השרת תומך ב-Range ומאפשר להוסיף השהיה, הגבלת רוחב פס לחיבור והזרקת שגיאות
+
+הרצה:
+    python pydown_bench.py                         # מטריצת ברירת המחדל, תוצאות ל-bench.json
+    python pydown_bench.py -s 16M 256M -t 1 8 16 --latency 0.02 --bandwidth 4M -o after.json
+    python pydown_bench.py --compare before.json after.json
+    python pydown_bench.py -s 128M -t 8 --strace   # ספירת syscalls אמיתית (כולל recv) דרך strace -c -f
+
+כל מקרה רץ בתהליך נפרד, כך ש-RSS שיא, זמן CPU ומוני קריאות ה-I/O שייכים רק להורדה שנמדדה.
+המונים (file_reads/file_writes) באים מ-/proc/self/io וסופרים רק read/write שעוברים דרך ה-VFS -
+recv/recv_into/send של sockets לא נכללים בהם; עם --strace כל מקרה רץ תחת strace -c -f ונספרים כל
+ה-syscalls של התהליך (כולל עליית המפרש), אבל התפוקה שנמדדת כך לא ברת השוואה לריצה בלי strace.
+השרת רץ גם הוא בתהליך נפרד ולא נכלל במדידה.
+"""
+
+import sys
+import os
+import json
+import time
+import random
+import socket
+import platform
+import argparse
+import tempfile
+import statistics
+import subprocess
+import http.server
+import socketserver
+import hashlib
+import shutil
+
+from pydown_core import parse_rate, format_size, format_speed
+
+BLOCK = 1 << 20
+DEFAULT_SIZES = ("1M", "16M", "128M")
+DEFAULT_THREADS = (1, 4, 8, 16)
+REGRESSION = 0.10  # ירידה של יותר מ-10% בתפוקה מסומנת כרגרסיה
+
+
+# ─── Server ───────────────────────────────────────────────────────────────────
+
+def _content_block(seed=1):
+    """בלוק אקראי קבוע שחוזר על עצמו - תוכן שלא נדחס ואפשר לשחזר בכל היסט"""
+    return random.Random(seed).randbytes(BLOCK)
+
+
+def expected_digest(size):
+    """SHA-256 של /<size> כפי שהשרת מגיש אותו - בלי להוריד"""
+    block, h = _content_block(), hashlib.sha256()
+    for _ in range(size // BLOCK): h.update(block)
+    h.update(block[:size % BLOCK])
+    return h.hexdigest()
+
+
+def file_digest(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(BLOCK), b""): h.update(chunk)
+    return h.hexdigest()
+
+
+class BenchHandler(http.server.BaseHTTPRequestHandler):
+    """GET/HEAD ל-/<size> (למשל /16M) עם Range; ההגדרות מגיעות מהשרת"""
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args): pass
+
+    def do_HEAD(self): self._serve(False)
+    def do_GET(self):  self._serve(True)
+
+    def _serve(self, body):
+        cfg = self.server.cfg
+        try:
+            size = parse_rate(self.path.lstrip("/").split("?")[0])
+        except ValueError:
+            size = 0
+        if size <= 0:
+            return self._empty(404)
+        if cfg["latency"]: time.sleep(cfg["latency"])
+        if body and random.random() < cfg["error_rate"]:
+            return self._empty(503)
+        start, end, code = 0, size - 1, 200
+        rng = self.headers.get("Range")
+        if rng and rng.startswith("bytes="):
+            s, _, e = rng[6:].partition("-")
+            start, end, code = int(s), min(int(e) if e else size - 1, size - 1), 206
+            if start > end:
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{size}")
+                self.send_header("Content-Length", "0")
+                self.end_headers(); return
+        self.send_response(code)
+        self.send_header("Content-Length", str(end - start + 1))
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("ETag", f'"bench-{size}"')
+        if code == 206: self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        self.end_headers()
+        if body: self._body(start, end, cfg)
+
+    def _empty(self, code):
+        self.send_response(code)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def _body(self, start, end, cfg):
+        data = self.server.data
+        chunk, rate = 64 * 1024, cfg["bandwidth"]
+        pos, t0 = start, time.time()
+        while pos <= end:
+            off = pos % BLOCK
+            n = min(chunk, end - pos + 1, BLOCK - off)
+            try:
+                self.wfile.write(data[off:off + n])
+            except OSError:
+                return
+            pos += n
+            if cfg["drop_rate"] and random.random() < cfg["drop_rate"]:
+                # ניתוק באמצע התשובה - כמו תקלת רשת
+                self.close_connection = True
+                self.connection.shutdown(socket.SHUT_RDWR); return
+            if rate:
+                ahead = (pos - start) / rate - (time.time() - t0)
+                if ahead > 0: time.sleep(ahead)
+
+
+class BenchServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, port, cfg):
+        super().__init__(("127.0.0.1", port), BenchHandler)
+        self.cfg = cfg
+        self.data = memoryview(_content_block())
+
+    def handle_error(self, request, client_address):
+        # לקוח שסוגר חיבור keep-alive הוא מצב רגיל, לא שגיאה
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+def serve(port, cfg):
+    srv = BenchServer(port, cfg)
+    print(srv.server_address[1], flush=True)
+    srv.serve_forever()
+
+
+def start_server(args):
+    """מריץ את השרת בתהליך נפרד ומחזיר (process, port)"""
+    cmd = [sys.executable, os.path.abspath(__file__), "--serve", "0",
+           "--latency", str(args.latency), "--bandwidth", args.bandwidth,
+           "--error-rate", str(args.error_rate), "--drop-rate", str(args.drop_rate)]
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, text=True)
+    return proc, int(proc.stdout.readline())
+
+
+# ─── Case Runner ──────────────────────────────────────────────────────────────
+
+def _proc_io():
+    """syscr/syscw מ-/proc (לינוקס בלבד): read/write על קבצים ו-pipes. recv על socket לא עובר דרך
+    vfs_read ולכן לא נספר - אלה מוני I/O של קבצים, לא כל ה-syscalls"""
+    try:
+        with open("/proc/self/io") as f:
+            fields = dict(line.split(": ") for line in f.read().splitlines())
+        return int(fields["syscr"]), int(fields["syscw"])
+    except (OSError, KeyError, ValueError):
+        return None, None
+
+
+def run_case(case):
+    """רץ בתהליך הילד: הורדה אחת ומדידות. מחזיר dict"""
+    import resource
+    import threading
+    import pydown_core as core
+    from pydown_core import Downloader, AsyncDownload, AsyncEngine
+
+    size = case["size"]
+    # _multi תמיד, גם לקבצים קטנים, כדי שאפשר יהיה להשוות את שני המסלולים בכל גודל
+    if case["mode"] == "multi": core.SMALL_FILE = 0
+    info = {"total": size, "supports_range": case["mode"] == "multi", "filename": "bench.bin"}
+    url = f"http://127.0.0.1:{case['port']}/{size}"
+    fd, path = tempfile.mkstemp(prefix="pydown-bench-", suffix=".bin", dir=case.get("dir"))
+    os.close(fd)
+
+    done, result = threading.Event(), {}
+    def finished(ok, msg, status):
+        result.update(ok=ok, message=msg); done.set()
+
+    r0, (sr0, sw0), t0 = resource.getrusage(resource.RUSAGE_SELF), _proc_io(), time.perf_counter()
+    kw = dict(on_finished=finished, preallocate=case["preallocate"])
+    if case["engine"] == "async":
+        dl = AsyncDownload(AsyncEngine.shared(), url, path, case["threads"], info=info, **kw)
+        AsyncEngine.shared().submit(dl.run())
+    else:
+        dl = Downloader(url, path, case["threads"], info=info, **kw)
+        threading.Thread(target=dl.run, daemon=True).start()
+    if not done.wait(case["timeout"]):
+        dl.cancel(); result.update(ok=False, message="timeout")
+    wall = time.perf_counter() - t0
+    r1, (sr1, sw1) = resource.getrusage(resource.RUSAGE_SELF), _proc_io()
+
+    # גודל לא מספיק: ב-multi הקובץ מוקצה מראש לגודל המלא לפני שהגיע בית אחד
+    ok = result.get("ok", False)
+    if ok and file_digest(path) != expected_digest(size):
+        ok, result["message"] = False, "hash mismatch"
+    for p in (path, path + core.DownloadJournal.SUFFIX):
+        if os.path.exists(p): os.remove(p)
+    return {
+        **{k: case[k] for k in ("engine", "mode", "size", "threads")},
+        "ok": ok, "message": result.get("message"),
+        "wall": wall,
+        "throughput": size / wall if ok and wall > 0 else 0.0,
+        "cpu_user": r1.ru_utime - r0.ru_utime,
+        "cpu_sys": r1.ru_stime - r0.ru_stime,
+        "peak_rss_kb": r1.ru_maxrss,
+        "file_reads": sr1 - sr0 if sr0 is not None else None,
+        "file_writes": sw1 - sw0 if sw0 is not None else None,
+    }
+
+
+def parse_strace(text):
+    """טבלת הסיכום של strace -c -> {syscall: calls}"""
+    counts = {}
+    for line in text.splitlines():
+        parts = line.split()
+        # % time, seconds, usecs/call, calls, [errors], syscall
+        if len(parts) < 5 or not parts[0][0].isdigit() or parts[-1] == "total": continue
+        try:
+            counts[parts[-1]] = int(parts[3])
+        except ValueError:
+            pass
+    return counts
+
+
+def spawn_case(case, strace=False):
+    cmd = [sys.executable, os.path.abspath(__file__), "--case", json.dumps(case)]
+    if strace:
+        fd, trace = tempfile.mkstemp(prefix="pydown-bench-", suffix=".strace")
+        os.close(fd)
+        cmd = ["strace", "-c", "-f", "-o", trace] + cmd
+    try:
+        proc = subprocess.run(cmd, capture_output=True, text=True, timeout=case["timeout"] + 30)
+        if proc.returncode:
+            return {**{k: case[k] for k in ("engine", "mode", "size", "threads")},
+                    "ok": False, "message": (proc.stderr.strip().splitlines() or ["crash"])[-1]}
+        result = json.loads(proc.stdout.splitlines()[-1])
+        if strace:
+            with open(trace) as f: counts = parse_strace(f.read())
+            result.update(syscalls=sum(counts.values()), syscall_counts=counts)
+        return result
+    finally:
+        if strace: os.remove(trace)
+
+
+def summarize(runs):
+    """חציון על פני החזרות - פחות רגיש לריצה חריגה אחת"""
+    good = [r for r in runs if r["ok"]] or runs
+    out = dict(good[0])
+    for k in ("wall", "throughput", "cpu_user", "cpu_sys", "peak_rss_kb", "file_reads", "file_writes",
+              "syscalls"):
+        vals = [r[k] for r in good if r.get(k) is not None]
+        if vals: out[k] = statistics.median(vals)
+    out["ok"] = all(r["ok"] for r in runs)
+    out["repeats"] = len(runs)
+    return out
+
+
+# ─── Report ───────────────────────────────────────────────────────────────────
+
+def case_key(r):
+    return f"{r['engine']}/{r['mode']}/{r['size']}/{r['threads']}"
+
+
+def print_table(results, out=sys.stdout):
+    traced = any(r.get("syscalls") is not None for r in results)
+    print(f"{'engine':7} {'mode':6} {'size':>9} {'thr':>3} {'speed':>12} {'cpu':>7} {'rss':>9} {'file I/O':>9}"
+          + (f" {'syscalls':>9}" if traced else ""), file=out)
+    for r in results:
+        calls = int((r.get("file_reads") or 0) + (r.get("file_writes") or 0))
+        cpu = r.get("cpu_user", 0) + r.get("cpu_sys", 0)
+        speed = format_speed(r["throughput"]) if r["ok"] else f"✗ {r.get('message') or ''}"[:12]
+        print(f"{r['engine']:7} {r['mode']:6} {format_size(r['size']):>9} {r['threads']:>3} {speed:>12} "
+              f"{cpu:6.2f}s {format_size(r.get('peak_rss_kb', 0) * 1024):>9} {calls:>9}"
+              + (f" {int(r.get('syscalls') or 0):>9}" if traced else ""), file=out)
+
+
+def compare(old_path, new_path, threshold=REGRESSION):
+    """משווה שני קבצי תוצאות; קוד יציאה 1 אם יש רגרסיה בתפוקה"""
+    with open(old_path) as f: old = {case_key(r): r for r in json.load(f)["results"]}
+    with open(new_path) as f: new = {case_key(r): r for r in json.load(f)["results"]}
+    regressed = 0
+    print(f"{'case':28} {'before':>12} {'after':>12} {'delta':>8}")
+    for key in sorted(old.keys() & new.keys()):
+        a, b = old[key]["throughput"], new[key]["throughput"]
+        delta = (b - a) / a if a else 0.0
+        flag = ""
+        if delta < -threshold: flag, regressed = "  ⚠ רגרסיה", regressed + 1
+        print(f"{key:28} {format_speed(a):>12} {format_speed(b):>12} {delta:+7.1%}{flag}")
+    return 1 if regressed else 0
+
+
+# ─── Main ─────────────────────────────────────────────────────────────────────
+
+def parse_args(argv):
+    p = argparse.ArgumentParser(prog="pydown-bench", description="PyDown - מדידת תפוקה מול שרת מקומי")
+    p.add_argument("-s", "--sizes", nargs="+", default=DEFAULT_SIZES, help="גדלי קבצים (למשל 1M 128M)")
+    p.add_argument("-t", "--threads", nargs="+", type=int, default=DEFAULT_THREADS, help="מספרי חוטים ל-_multi")
+    p.add_argument("-m", "--modes", nargs="+", choices=("single", "multi"), default=("single", "multi"))
+    p.add_argument("-e", "--engines", nargs="+", choices=("threads", "async"), default=("threads",))
+    p.add_argument("-r", "--repeat", type=int, default=3, help="חזרות לכל מקרה (מדווח חציון)")
+    p.add_argument("-o", "--out", default="bench.json", help="קובץ תוצאות JSON")
+    p.add_argument("--latency", type=float, default=0.0, help="השהיה לכל בקשה בשניות")
+    p.add_argument("--bandwidth", default="0", help="רוחב פס לכל חיבור (למשל 4M; 0 = ללא)")
+    p.add_argument("--error-rate", type=float, default=0.0, help="הסתברות ל-503 בכל GET")
+    p.add_argument("--drop-rate", type=float, default=0.0, help="הסתברות לניתוק אחרי כל 64KB")
+    p.add_argument("--no-preallocate", action="store_true")
+    p.add_argument("--dir", help="תיקייה לקבצים הזמניים (ברירת מחדל: tmp של המערכת)")
+    p.add_argument("--timeout", type=float, default=300, help="זמן מקסימלי למקרה")
+    p.add_argument("--strace", action="store_true", help="ספירת כל ה-syscalls דרך strace -c -f (משנה את התפוקה)")
+    p.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"), help="השוואת שני קבצי תוצאות")
+    p.add_argument("--serve", type=int, help=argparse.SUPPRESS)
+    p.add_argument("--case", help=argparse.SUPPRESS)
+    return p.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.case:
+        print(json.dumps(run_case(json.loads(args.case)))); return 0
+    try:
+        bandwidth = parse_rate(args.bandwidth)
+        sizes = [parse_rate(s) for s in args.sizes]
+    except ValueError as e:
+        print(f"pydown-bench: {e}", file=sys.stderr); return 2
+    if args.serve is not None:
+        serve(args.serve, {"latency": args.latency, "bandwidth": bandwidth,
+                           "error_rate": args.error_rate, "drop_rate": args.drop_rate})
+        return 0
+    if args.compare:
+        return compare(*args.compare)
+    if args.strace and not shutil.which("strace"):
+        print("pydown-bench: --strace דורש את strace ב-PATH", file=sys.stderr); return 2
+
+    server, port = start_server(args)
+    results = []
+    try:
+        for engine in args.engines:
+            for mode in args.modes:
+                for size in sizes:
+                    for threads in (args.threads if mode == "multi" else (1,)):
+                        case = {"engine": engine, "mode": mode, "size": size, "threads": threads,
+                                "port": port, "preallocate": not args.no_preallocate,
+                                "timeout": args.timeout, "dir": args.dir}
+                        r = summarize([spawn_case(case, args.strace) for _ in range(args.repeat)])
+                        results.append(r)
+                        print(f"  {case_key(r)}: {format_speed(r['throughput']) if r['ok'] else r['message']}",
+                              file=sys.stderr, flush=True)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.terminate()
+
+    report = {
+        "created": time.time(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "server": {"latency": args.latency, "bandwidth": bandwidth,
+                   "error_rate": args.error_rate, "drop_rate": args.drop_rate},
+        "io_counters": "file_reads/file_writes: read/write דרך VFS מ-/proc/self/io, בלי recv/send של sockets",
+        "strace": args.strace,
+        "results": results,
+    }
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print_table(results)
+    print("\nfile I/O = read/write על קבצים ו-pipes בלבד; recv/send של sockets לא נספרים")
+    if args.strace: print("syscalls = strace -c -f על כל התהליך, כולל recv; התפוקה תחת strace איטית מהרגיל")
+    print(f"נשמר: {args.out}")
+    return 0 if all(r["ok"] for r in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
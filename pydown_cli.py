@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+PyDown CLI - הורדות מרובות חוטים משורת הפקודה, בלי PyQt6
+משתמש באותו מנוע הורדה כמו הממשק הגרפי (pydown_core)
+
+הרצה:
+    python pydown_cli.py URL [URL ...]
+    python pydown_cli.py -i urls.txt -d ./out -t 8 -j 4
+
+כל אירוע נכתב ל-stdout כשורת JSON:
+    {"event": "progress", "id": 0, "downloaded": ..., "total": ..., "speed": ..., "eta": ...}
+    {"event": "finished", "id": 0, "ok": true, "message": "...", "path": "..."}
+
+בקובץ רשימה: כתובת בכל שורה, ואופציונלית checksum אחריה (sha256:<hex> או כתובת sidecar)
+מראות לאותו קובץ מופרדים ב-| (גם בשורת הפקודה, בתוך מירכאות):
+    python pydown_cli.py "https://a.example/f.iso|https://b.example/f.iso"
+
+מדדים לכל מקטע (בתים, קצב רגעי ו-EWMA, ניסיונות חוזרים, TTFB):
+    --metrics-file m.json   קובץ JSON שמתעדכן פעם בשנייה
+    --metrics-port 9100     JSON ב-http://127.0.0.1:9100/ ו-Prometheus ב-/metrics (0 = פורט פנוי)
+
+קודי יציאה: 0 הכל הושלם, 1 לפחות הורדה אחת נכשלה, 2 שגיאת שימוש, 130 בוטל
+"""
+
+import sys
+import os
+import json
+import queue
+import time
+import argparse
+import threading
+
+from pydown_core import (
+    probe, unique_path, parse_rate, parse_schedule, LIMITER,
+    DownloadQueue, DownloadHistory, DownloadCache, Downloader, AsyncEngine, AsyncDownload, queue_connections,
+    READ_SIZE, MetricsServer, dump_metrics, SESSIONS
+)
+
+EXIT_OK, EXIT_FAILED, EXIT_USAGE, EXIT_INTERRUPTED = 0, 1, 2, 130
+
+
+def read_urls(args):
+    """[(url, checksum)] - בקובץ הרשימה אפשר לכתוב checksum בעמודה שנייה אחרי הכתובת;
+    url יכול להכיל כמה מראות מופרדים ב-|"""
+    urls = [(u, args.checksum) for u in args.urls]
+    if args.input:
+        f = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+        with f:
+            for line in f:
+                parts = line.split()
+                if parts and not parts[0].startswith("#"):
+                    urls.append((parts[0], parts[1] if len(parts) > 1 else None))
+    return urls
+
+
+def emit(event, **fields):
+    print(json.dumps({"event": event, **fields}, ensure_ascii=False), flush=True)
+
+
+def parse_threads(value):
+    """מספר חוטים, או 'auto' (0) - המנוע מכוונן את מספר החיבורים לפי הקצב הנמדד"""
+    if value.lower() in ("auto", "0"): return 0
+    try:
+        return max(1, min(16, int(value)))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"מספר חוטים לא תקין: {value}")
+
+
+def parse_args(argv):
+    p = argparse.ArgumentParser(prog="pydown", description="PyDown - מנהל הורדות ללא ממשק")
+    p.add_argument("urls", nargs="*", help="כתובות להורדה")
+    p.add_argument("-i", "--input", help="קובץ עם כתובת בכל שורה ('-' עבור stdin)")
+    p.add_argument("-d", "--dir", default=".", help="תיקיית שמירה")
+    p.add_argument("-t", "--threads", type=parse_threads, default=8, help="חוטים להורדה (1-16 או auto)")
+    p.add_argument("-j", "--jobs", type=int, default=3, help="הורדות במקביל")
+    p.add_argument("--connections", type=int, default=32, help="סך החיבורים המקסימלי")
+    p.add_argument("--per-host", type=int, default=8, help="חיבורים מקסימליים לכל מארח")
+    p.add_argument("--engine", choices=("threads", "async"), default="threads")
+    p.add_argument("--limit", default="0", help="מגבלת מהירות גלובלית (למשל 2M)")
+    p.add_argument("--limit-each", default="0", help="מגבלת מהירות לכל הורדה")
+    p.add_argument("--schedule", default="", help="לוח זמנים למגבלה, למשל 0-7:0,7-24:500K")
+    p.add_argument("--checksum", help="checksum צפוי לכתובות משורת הפקודה (sha256:..., md5:... או כתובת sidecar)")
+    p.add_argument("--no-preallocate", action="store_true", help="קובץ דליל במקום הקצאה מראש")
+    p.add_argument("--chunk-size", default=str(READ_SIZE), help="גודל קריאה מקסימלי מה-socket (למשל 256K, 1M)")
+    p.add_argument("--no-history", action="store_true", help="לא לרשום בהיסטוריית ההורדות")
+    p.add_argument("--cache", action="store_true",
+                   help="בקשה מותנית (ETag/Last-Modified) לכתובות שכבר הורדו, ואיחוד קבצים זהים")
+    p.add_argument("--metrics-file", help="קובץ JSON עם מדדי המקטעים של ההורדות הפעילות")
+    p.add_argument("--metrics-port", type=int, help="נקודת מדדים מקומית (JSON ו-Prometheus)")
+    p.add_argument("-q", "--quiet", action="store_true", help="בלי אירועי progress")
+    return p.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    try:
+        urls = read_urls(args)
+    except OSError as e:
+        print(f"pydown: {e}", file=sys.stderr); return EXIT_USAGE
+    if not urls:
+        print("pydown: לא סופקו כתובות", file=sys.stderr); return EXIT_USAGE
+    try:
+        LIMITER.configure(parse_rate(args.limit), parse_schedule(args.schedule))
+        limit_each = parse_rate(args.limit_each)
+    except ValueError as e:
+        print(f"pydown: מגבלת מהירות לא תקינה: {e}", file=sys.stderr); return EXIT_USAGE
+    try:
+        chunk_size = parse_rate(args.chunk_size)
+    except ValueError as e:
+        print(f"pydown: גודל קריאה לא תקין: {e}", file=sys.stderr); return EXIT_USAGE
+    os.makedirs(args.dir, exist_ok=True)
+    auto = args.threads == 0
+
+    events = queue.Queue()
+    dq = DownloadQueue(args.jobs, args.connections, args.per_host)
+    SESSIONS.configure(dq.pool_size())  # לפני AsyncEngine.shared(), שלוקח ממנו את גודל המאגר
+    items, running, failed = [], {}, 0
+    engine = AsyncEngine.shared() if args.engine == "async" else None
+    history = None if args.no_history else DownloadHistory()
+    cache = DownloadCache() if args.cache else None
+
+    def metrics():
+        return {str(i): {"url": items[i]["url"], "path": items[i].get("path"), **dl.telemetry.snapshot()}
+                for i, dl in list(running.items())}
+    last_dump = [0.0]
+
+    def dump(force=False):
+        if args.metrics_file and (force or time.time() - last_dump[0] >= 1):
+            dump_metrics(args.metrics_file, metrics()); last_dump[0] = time.time()
+
+    server = None
+    if args.metrics_port is not None:
+        try:
+            server = MetricsServer(args.metrics_port, metrics)
+        except OSError as e:
+            print(f"pydown: לא ניתן לפתוח את נקודת המדדים: {e}", file=sys.stderr); return EXIT_USAGE
+        emit("metrics", port=server.port)
+
+    for i, (spec, checksum) in enumerate(urls):
+        url, *mirrors = [u for u in spec.split("|") if u]
+        # ה-probe לפני התור: הורדה שתרד ב-GET יחיד מחזיקה חיבור אחד, גם במצב אוטו
+        item = {"id": i, "url": url, "mirrors": mirrors, "checksum": checksum, "info": probe(url)}
+        items.append(item)
+        dq.add(item, url, queue_connections(item["info"], args.threads))
+
+    def start(item, n):
+        info = item.pop("info")
+        taken = {it["path"] for it in items if "path" in it}
+        cached = cache and cache.path_for(item["url"], args.dir)
+        item["path"] = cached if cached and cached not in taken else \
+            unique_path(args.dir, info["filename"], item["url"], taken)
+        i = item["id"]
+        cb = dict(on_progress=lambda *a: events.put(("progress", i, a)),
+                  on_finished=lambda ok, msg, status: events.put(("finished", i, (ok, msg, status))),
+                  on_status=lambda st: events.put(("status", i, (st,))),
+                  rate_limit=limit_each, checksum=item["checksum"], auto=auto, mirrors=item["mirrors"],
+                  cache=cache, chunk_size=chunk_size)
+        if engine:
+            dl = AsyncDownload(engine, item["url"], item["path"], n, not args.no_preallocate, info, **cb)
+            engine.submit(dl.run())
+        else:
+            dl = Downloader(item["url"], item["path"], n, not args.no_preallocate, info, **cb)
+            threading.Thread(target=dl.run, daemon=True).start()
+        running[i] = dl
+        item.update(started=time.time(), base=None, peak=0.0, downloaded=0)
+        if history:
+            item["hid"] = history.add(item["url"], os.path.basename(item["path"]), os.path.abspath(item["path"]),
+                                      n, limit_each, item["checksum"], status="מוריד", mirrors=item["mirrors"],
+                                      cache=cache is not None)
+            history.update(item["hid"], started=item["started"])
+        emit("started", id=i, url=item["url"], path=item["path"], threads="auto" if auto else n,
+             **({"mirrors": item["mirrors"]} if item["mirrors"] else {}))
+
+    try:
+        for item, n in dq.take(): start(item, n)
+        while running:
+            kind, i, data = events.get()
+            if kind == "progress":
+                dl, total, speed, eta = data
+                it = items[i]
+                if it["base"] is None: it["base"] = max(0, dl - int(speed * 0.5))
+                it["peak"], it["downloaded"] = max(it["peak"], speed), dl
+                if not args.quiet:
+                    emit("progress", id=i, downloaded=dl, total=total, speed=round(speed), eta=round(eta, 1))
+                dump()
+            elif kind == "finished":
+                ok, msg, status = data
+                failed += not ok
+                running.pop(i, None)
+                dq.release(items[i])
+                if history:
+                    it = items[i]
+                    size = os.path.getsize(it["path"]) if ok and os.path.exists(it["path"]) else it["downloaded"]
+                    history.finish(it["hid"], status, msg, size, it["started"], it["base"] or 0, it["peak"])
+                emit("finished", id=i, ok=ok, status=status, message=msg, path=items[i].get("path"))
+                for item, n in dq.take(): start(item, n)
+                dump(force=True)
+    except KeyboardInterrupt:
+        for dl in running.values(): dl.cancel()
+        # נותנים להורדות לשמור את היומן כדי שהרצה הבאה תמשיך מאותה נקודה
+        try:
+            while running:
+                kind, i, _ = events.get(timeout=2)
+                if kind == "finished": running.pop(i, None)
+        except queue.Empty:
+            pass
+        emit("interrupted", pending=len(running))
+        return EXIT_INTERRUPTED
+    finally:
+        if server: server.close()
+    return EXIT_FAILED if failed else EXIT_OK
+
+
+if __name__ == "__main__":
+    sys.exit(main())
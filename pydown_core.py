@@ -0,0 +1,1943 @@
+"""
+PyDown Core - מנוע ההורדה של PyDown, בלי תלות ב-Qt
+משמש גם את הממשק הגרפי (pydown.py) וגם את שורת הפקודה (pydown_cli.py)
+"""
+
+import os
+import ssl
+import shutil
+import json
+import math
+import sqlite3
+import heapq
+import asyncio
+import hashlib
+import itertools
+import time
+import random
+import threading
+import concurrent.futures
+import http.client
+import http.server
+import requests
+from requests.adapters import HTTPAdapter
+from urllib.parse import urlparse, unquote, urljoin
+
+
+# ─── Utilities ────────────────────────────────────────────────────────────────
+
+# המצב הסופי שההורדה מדווחת ל-on_finished לצד ההודעה - הוא ה-status בטבלה ובהיסטוריה
+DONE, VERIFIED, CORRUPT, CANCELLED, FAILED = "הושלם", "אומת", "פגום", "בוטל", "שגיאה"
+
+def format_size(b):
+    if b <= 0: return "0 B"
+    units = ["B","KB","MB","GB","TB"]
+    i = min(int(math.floor(math.log(b, 1024))), 4)
+    return f"{round(b / math.pow(1024, i), 2)} {units[i]}"
+
+def format_speed(bps):
+    return f"{format_size(bps)}/s" if bps > 0 else "—"
+
+def format_eta(sec):
+    if sec <= 0 or sec == float('inf'): return "—"
+    m, s = divmod(int(sec), 60)
+    h, m = divmod(m, 60)
+    return f"{h:02d}:{m:02d}:{s:02d}" if h else f"{m:02d}:{s:02d}"
+
+def get_filename(url, headers=None):
+    if headers:
+        cd = headers.get('content-disposition', '')
+        if 'filename=' in cd:
+            return cd.split('filename=')[-1].strip().strip('"\'')
+    name = unquote(os.path.basename(urlparse(url).path))
+    return name or f"download_{int(time.time())}"
+
+def unique_path(save_dir, fname, url, taken=()):
+    """נתיב פנוי בתיקייה; קובץ קיים עם יומן של אותה כתובת נחשב פנוי כדי שההורדה תמשיך"""
+    save_path = os.path.join(save_dir, fname)
+    base, ext = os.path.splitext(save_path)
+    c = 1
+    while save_path in taken or os.path.exists(save_path) and DownloadJournal.url_of(save_path) != url:
+        save_path = f"{base}_{c}{ext}"; c += 1
+    return save_path
+
+def allocate_file(path, total, preallocate=True):
+    with open(path, 'wb') as f:
+        if preallocate and hasattr(os, "posix_fallocate"):
+            try:
+                os.posix_fallocate(f.fileno(), 0, total); return
+            except OSError:
+                pass
+        f.truncate(total)
+
+
+# ─── Receive Path ─────────────────────────────────────────────────────────────
+
+READ_SIZE = 512 * 1024       # תקרת הקריאה האדפטיבית מה-socket
+PAUSE_GRACE = 10.0           # הפסקה קצרה מזה שומרת על החיבורים; ארוכה ממנה משחררת אותם
+WRITE_BLOCK = 2 * 1024 * 1024  # כמה מצטבר בזיכרון לפני pwrite
+IDENTITY = {'Accept-Encoding': 'identity'}  # היסטים של Range מתייחסים לתוכן הלא-מקודד
+
+
+def raw_readinto(resp):
+    """readinto ישיר מה-socket של תשובת requests, בלי העתקת ביניים של urllib3;
+    תוכן מקודד (gzip) עובר דרך urllib3 כדי שיפוענח"""
+    fp = getattr(resp.raw, "_fp", None)
+    if fp is not None and hasattr(fp, "readinto") and not resp.headers.get("content-encoding"):
+        return fp.readinto
+    return resp.raw.readinto
+
+
+def release_body(resp):
+    """אחרי raw_readinto: requests לא יודע שהגוף נקרא, ו-close() שלו היה סוגר את ה-socket.
+    גוף שנקרא עד סופו מחזיר את החיבור למאגר; גוף שנקטע לפני content-length הוא שגיאה -
+    http.client מחזיר 0 ולא זורק. תשובה שלא נקראה עד הסוף (זנב שנגנב) נסגרת כרגיל"""
+    fp = getattr(resp.raw, "_fp", None)
+    if fp is None or not fp.isclosed(): return
+    if fp.length: raise ConnectionError("החיבור נסגר לפני סוף התשובה")
+    if not fp.will_close: resp.raw.release_conn()
+
+
+def _pwrite(fd, data, offset):
+    if hasattr(os, "pwrite"):
+        while data:
+            n = os.pwrite(fd, data, offset)
+            data, offset = data[n:], offset + n
+    else:
+        os.lseek(fd, offset, os.SEEK_SET)
+        while data:
+            data = data[os.write(fd, data):]
+
+
+class ReadSizer:
+    """גודל קריאה אדפטיבי: מוכפל כל עוד קריאה מלאה חוזרת מהר, ומוקטן כשקריאה מתעכבת -
+    כך שבקו מהיר יש מעט איטרציות, ובקו איטי השהיה, ביטול ומד ההתקדמות נשארים תגובתיים"""
+    MIN = 16 * 1024
+    FAST, SLOW = 0.02, 0.25
+
+    def __init__(self, max_size=READ_SIZE):
+        self.max = max(self.MIN, max_size)
+        self.size = min(64 * 1024, self.max)
+
+    def update(self, n, elapsed):
+        if n >= self.size and elapsed < self.FAST: self.size = min(self.max, self.size * 2)
+        elif elapsed > self.SLOW: self.size = max(self.MIN, self.size // 2)
+
+
+class BlockWriter:
+    """מאגד את מה שהתקבל לבלוקים גדולים, מיושרים לעמוד, לפני pwrite.
+    קוראים ישירות לתוך הבאפר (room/commit), כך שאין העתקת ביניים; on_flush (יומן, hash)
+    רואה רק בתים שכבר נכתבו לדיסק, ולכן היומן אף פעם לא מקדים את הקובץ.
+    מקורות בלי readinto מעתיקים עם put(), שלא כותב לדיסק בעצמו - כשהבאפר full קוראים ל-drain()"""
+    ALIGN = 4096
+
+    def __init__(self, fd, pos, block=WRITE_BLOCK, on_flush=None, end=None):
+        self.fd = fd
+        self.pos = pos                # ההיסט בקובץ של תחילת הבאפר
+        self.block = max(block, 2 * self.ALIGN)
+        self.buf = bytearray(self.block)
+        self.view = memoryview(self.buf)
+        self.fill = 0
+        self.on_flush = on_flush
+        self.end = end                # callable: הבייט האחרון המותר - יכול להתקצר כשחוט אחר גונב את הזנב
+
+    @property
+    def tail(self):
+        return self.pos + self.fill
+
+    def remaining(self):
+        return self.end() - self.tail + 1 if self.end else None
+
+    def room(self, want):
+        """memoryview לקריאה הבאה; ריק כשהגענו לסוף הטווח"""
+        if self.full: self.drain()
+        n = min(want, self.block - self.fill)
+        if self.end: n = min(n, self.remaining())
+        return self.view[self.fill:self.fill + max(n, 0)]
+
+    def commit(self, n):
+        self.fill += n
+
+    @property
+    def full(self):
+        return self.fill == self.block
+
+    def put(self, data):
+        """מעתיק לבאפר כמה שנכנס, עד סוף הטווח; מחזיר כמה נכנסו (0 כשהבאפר מלא או בסוף הטווח)"""
+        n = min(len(data), self.block - self.fill)
+        if self.end: n = max(0, min(n, self.remaining()))
+        self.view[self.fill:self.fill + n] = data[:n]
+        self.fill += n
+        return n
+
+    def drain(self):
+        """כותב את החלק המיושר של הבאפר ומשאיר את השארית לבלוק הבא"""
+        aligned = (self.pos + self.fill) // self.ALIGN * self.ALIGN - self.pos
+        self._write(aligned if aligned > 0 else self.fill)
+
+    def flush(self):
+        if self.fill: self._write(self.fill)
+
+    def _write(self, n):
+        keep = n
+        if self.end: keep = max(0, min(n, self.remaining() + self.fill))
+        if keep:
+            data = self.view[:keep]
+            _pwrite(self.fd, data, self.pos)
+            if self.on_flush: self.on_flush(self.pos, data)
+            self.pos += keep
+        if keep < n:
+            self.fill = 0  # מה שמעבר לסוף שייך עכשיו לחוט שגנב את הזנב
+        else:
+            rest = self.fill - n
+            if rest: self.buf[:rest] = self.buf[n:self.fill]
+            self.fill = rest
+
+
+# ─── HTTP Errors ──────────────────────────────────────────────────────────────
+
+class HTTPStatusError(IOError):
+    def __init__(self, status, reason=""):
+        super().__init__(f"{status} {reason}".strip())
+        self.status = status
+
+def http_status(ex):
+    """קוד ה-HTTP של שגיאה מ-requests או מהלקוח האסינכרוני, או None"""
+    if isinstance(ex, HTTPStatusError): return ex.status
+    resp = getattr(ex, "response", None)
+    return getattr(resp, "status_code", None)
+
+
+class ConnectionReleased(Exception):
+    """הפסקה ארוכה - החיבור נסגר, והמקטע יתחבר מחדש עם Range מההיסט שנכתב כשההורדה תחודש"""
+
+
+class RetryPolicy:
+    """מתי ואחרי כמה זמן לנסות שוב מקטע שנכשל. שגיאות רשת חולפות (timeout, ניתוק, 5xx, 408/429)
+    מנוסות שוב עם backoff אקספוננציאלי ו-jitter; 4xx אחרים (404, 416...) ושגיאות דיסק הן סופיות"""
+    ATTEMPTS = 6
+    BASE, CAP = 0.5, 30.0
+    RETRY_STATUSES = (408, 425, 429)
+    TRANSIENT = (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError,
+                 ConnectionError, TimeoutError, asyncio.TimeoutError, asyncio.IncompleteReadError,
+                 http.client.IncompleteRead)
+
+    @classmethod
+    def retryable(cls, ex):
+        status = http_status(ex)
+        if status is not None: return status >= 500 or status in cls.RETRY_STATUSES
+        return isinstance(ex, cls.TRANSIENT)
+
+    @classmethod
+    def delay(cls, attempt):
+        # jitter כדי שכל המקטעים שנפלו יחד לא יחזרו לשרת באותו רגע
+        return random.uniform(0.5, 1.0) * min(cls.CAP, cls.BASE * 2 ** attempt)
+
+
+# ─── Bandwidth Limiter ────────────────────────────────────────────────────────
+
+def parse_rate(text):
+    """'500K', '2M', '1.5G' או מספר בבתים לשנייה; 0 = ללא הגבלה"""
+    text = str(text).strip().upper().rstrip("B/S")
+    mult = {"K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}.get(text[-1:], 1)
+    return int(float(text[:-1] if mult > 1 else text or 0) * mult)
+
+def parse_schedule(text):
+    """'0-7:0,7-24:500K' -> [(0, 7, 0), (7, 24, 512000)] - שעות מקומיות, הכלל הראשון שמתאים קובע"""
+    rules = []
+    for part in filter(None, (p.strip() for p in text.split(","))):
+        hours, rate = part.split(":")
+        start, end = (float(h) for h in hours.split("-"))
+        rules.append((start, end, parse_rate(rate)))
+    return rules
+
+
+class TokenBucket:
+    """דלי אסימונים thread-safe; rate=0 פירושו ללא הגבלה. שינוי קצב חל מיד גם על הורדות רצות"""
+
+    def __init__(self, rate=0):
+        self._lock = threading.Lock()
+        self.set_rate(rate)
+
+    def set_rate(self, rate):
+        with self._lock:
+            self.rate = max(0, int(rate))
+            self.burst = max(self.rate, 65536)
+            self.tokens, self._t = 0.0, time.monotonic()
+
+    def reserve(self, n):
+        """לוקח n אסימונים (אפשר להיכנס לחוב) ומחזיר כמה שניות צריך לחכות לפני הקריאה הבאה"""
+        with self._lock:
+            if not self.rate: return 0.0
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self._t) * self.rate) - n
+            self._t = now
+            return -self.tokens / self.rate if self.tokens < 0 else 0.0
+
+
+class RateLimiter:
+    """מגבלה גלובלית לכל ההורדות, עם לוח זמנים אופציונלי [(משעה, עד שעה, bytes/s)]"""
+
+    def __init__(self, rate=0, schedule=()):
+        self.bucket = TokenBucket(rate)
+        self.base_rate = rate
+        self.schedule = list(schedule)
+        self._checked = 0.0
+
+    def configure(self, rate=None, schedule=None):
+        if rate is not None: self.base_rate = rate
+        if schedule is not None: self.schedule = list(schedule)
+        self._checked = 0.0
+
+    def current_rate(self, now=None):
+        t = time.localtime(now)
+        hour = t.tm_hour + t.tm_min / 60
+        for start, end, rate in self.schedule:
+            if start <= hour < end: return rate
+        return self.base_rate
+
+    def reserve(self, n):
+        now = time.monotonic()
+        if now - self._checked >= 1.0:
+            self._checked = now
+            rate = self.current_rate()
+            if rate != self.bucket.rate: self.bucket.set_rate(rate)
+        return self.bucket.reserve(n)
+
+
+LIMITER = RateLimiter()
+
+
+# ─── Connection Pool ──────────────────────────────────────────────────────────
+
+class SessionPool:
+    """Session משותף לכל מארח - חיבורי keep-alive נשמרים בין מקטעים ובין הורדות"""
+
+    def __init__(self, pool_size=16):
+        self.pool_size = pool_size
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def get(self, url):
+        p = urlparse(url)
+        key = (p.scheme, p.netloc)
+        with self._lock:
+            s = self._sessions.get(key)
+            if s is None:
+                s = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+                s.mount("http://", adapter); s.mount("https://", adapter)
+                self._sessions[key] = s
+            return s
+
+    def configure(self, pool_size):
+        with self._lock:
+            self.pool_size = pool_size
+            old, self._sessions = self._sessions, {}
+        for s in old.values(): s.close()
+
+    def close(self):
+        self.configure(self.pool_size)
+
+
+SESSIONS = SessionPool()
+
+
+def probe(url, timeout=15):
+    """HEAD יחיד שמחזיר את כל מה שצריך לדעת על ההורדה - נעשה פעם אחת ומועבר ל-worker"""
+    try:
+        head = SESSIONS.get(url).head(url, allow_redirects=True, timeout=timeout)
+        return {"total": int(head.headers.get('content-length', 0)),
+                "supports_range": 'bytes' in head.headers.get('accept-ranges', ''),
+                "filename": get_filename(url, head.headers),
+                "etag": head.headers.get('etag'),
+                "last_modified": head.headers.get('last-modified')}
+    except Exception:
+        return {"total": 0, "supports_range": False, "filename": get_filename(url)}
+
+
+# ─── Download Journal ─────────────────────────────────────────────────────────
+
+class DownloadJournal:
+    """יומן התקדמות לכל הורדה - שומר את ההיסט של כל מקטע כדי שאפשר יהיה להמשיך גם אחרי הפעלה מחדש"""
+    SUFFIX = ".pydown"
+
+    def __init__(self, save_path):
+        self.path = save_path + self.SUFFIX
+        self.url = None
+        self.total = 0
+        self.segments = []  # [start, end, pos] - pos הוא הבייט הבא שצריך להוריד
+        self.lock = threading.Lock()
+
+    @classmethod
+    def url_of(cls, save_path):
+        try:
+            with open(save_path + cls.SUFFIX, encoding="utf-8") as f:
+                return json.load(f).get("url")
+        except (OSError, ValueError):
+            return None
+
+    def load(self, url, total):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if data.get("url") != url or data.get("total") != total:
+            return False
+        self.url, self.total = url, total
+        self.segments = [list(seg) for seg in data.get("segments", [])]
+        return bool(self.segments)
+
+    def reset(self, url, total, ranges):
+        self.url, self.total = url, total
+        self.segments = [[s, e, s] for s, e in ranges]
+
+    def advance(self, i, n):
+        with self.lock: self.segments[i][2] += n
+
+    def set_pos(self, i, pos):
+        with self.lock: self.segments[i][2] = pos
+
+    def done(self):
+        return sum(pos - s for s, _, pos in self.segments)
+
+    def frontier(self):
+        """ההיסט הראשון שעוד לא ירד - עד אליו הקובץ רציף"""
+        with self.lock:
+            for s, e, pos in sorted(self.segments):
+                if pos <= e: return pos
+        return self.total
+
+    def save(self):
+        with self.lock:
+            data = {"url": self.url, "total": self.total, "segments": [list(seg) for seg in self.segments]}
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp, self.path)
+
+    def remove(self):
+        for p in (self.path, self.path + ".tmp"):
+            try: os.remove(p)
+            except OSError: pass
+
+
+# ─── Integrity ────────────────────────────────────────────────────────────────
+
+def resolve_checksum(spec, timeout=15):
+    """'sha256:<hex>', 'md5:<hex>', hex חשוף או כתובת לקובץ sidecar (.sha256/.md5) -> (algo, hex)"""
+    if not spec: return None
+    spec = spec.strip()
+    if spec.startswith(("http://", "https://")):
+        r = SESSIONS.get(spec).get(spec, timeout=timeout)
+        r.raise_for_status()
+        words = r.text.split()
+        algo = os.path.splitext(urlparse(spec).path)[1].lstrip(".").lower()
+        spec = (f"{algo}:" if algo in hashlib.algorithms_available else "") + (words[0] if words else "")
+    algo, _, value = spec.rpartition(":")
+    value = value.lower()
+    algo = (algo or {32: "md5", 40: "sha1", 64: "sha256", 128: "sha512"}.get(len(value), "")).lower()
+    if algo not in hashlib.algorithms_available or not value:
+        raise ValueError(f"checksum לא תקין: {spec}")
+    return algo, value
+
+
+class StreamHasher:
+    """hash לפי סדר ההיסטים תוך כדי ההורדה.
+    המקטע שנמצא בחזית מזין את ה-hash ישירות מהזיכרון; מקטעים שהקדימו נקראים
+    מה-page cache רק כשהחזית מגיעה אליהם, כך שאין קריאה שנייה של כל הקובץ בסוף"""
+
+    def __init__(self, algo, expected, path):
+        self.algo = algo
+        self.expected = expected
+        self.path = path
+        self.pos = 0
+        self._h = hashlib.new(algo)
+        self._lock = threading.Lock()
+
+    def feed(self, offset, data):
+        if offset != self.pos: return
+        with self._lock:
+            if offset == self.pos:
+                self._h.update(data); self.pos += len(data)
+
+    def catch_up(self, frontier):
+        if self.pos >= frontier: return
+        with self._lock, open(self.path, 'rb') as f:
+            f.seek(self.pos)
+            while self.pos < frontier:
+                data = f.read(min(1 << 20, frontier - self.pos))
+                if not data: break
+                self._h.update(data); self.pos += len(data)
+
+    def hexdigest(self):
+        return self._h.hexdigest()
+
+    def result(self):
+        """(מצב סופי, הודעה)"""
+        if self.expected is None: return DONE, "הושלם"  # hash בלבד, בשביל המטמון
+        if self._h.hexdigest() == self.expected: return VERIFIED, "אומת"
+        return CORRUPT, f"אימות נכשל: {self.algo} לא תואם"
+
+
+# ─── Segment Scheduler ────────────────────────────────────────────────────────
+
+class SegmentScheduler:
+    """מחלק מקטעים מתור משותף; חוט שהתפנה גונב את חצי הזנב של המקטע שיסיים אחרון"""
+    MIN_SEGMENT = 1024 * 1024
+    SEGMENTS_PER_THREAD = 4
+    MIN_SPLIT = 512 * 1024  # חייב להיות גדול בהרבה מגודל קריאה אחת
+
+    def __init__(self, journal):
+        self.journal = journal
+        self.pending = [i for i, (_, e, pos) in enumerate(journal.segments) if pos <= e]
+        self.pending.reverse()
+        self.active = {}  # index -> (t0, pos0) למדידת קצב
+        self.writers = {}  # index -> BlockWriter: מה שהתקבל ועוד לא נכתב שייך למקטע ולא ייגנב
+        self.stopped = False
+
+    @classmethod
+    def initial_ranges(cls, total, threads):
+        n = max(1, min(threads * cls.SEGMENTS_PER_THREAD, math.ceil(total / cls.MIN_SEGMENT)))
+        chunk = math.ceil(total / n)
+        return [(i * chunk, min((i+1)*chunk - 1, total-1)) for i in range(n) if i * chunk < total]
+
+    def next(self):
+        j = self.journal
+        with j.lock:
+            if self.stopped: return None
+            if self.pending:
+                i = self.pending.pop()
+            else:
+                i = self._steal()
+                if i is None: return None
+            self.active[i] = (time.time(), j.segments[i][2])
+            return i
+
+    def track(self, i, writer):
+        with self.journal.lock: self.writers[i] = writer
+
+    def _tail(self, i):
+        w = self.writers.get(i)
+        return max(w.tail, self.journal.segments[i][2]) if w else self.journal.segments[i][2]
+
+    def _steal(self):
+        segs, now = self.journal.segments, time.time()
+        victim, worst = None, -1.0
+        for i, (t0, p0) in self.active.items():
+            e, tail = segs[i][1], self._tail(i)
+            left = e - tail + 1
+            if left < 2 * self.MIN_SPLIT: continue
+            rate = (tail - p0) / max(now - t0, 1e-3)
+            eta = left / rate if rate > 0 else float('inf')
+            if eta > worst: victim, worst = i, eta
+        if victim is None: return None
+        e, tail = segs[victim][1], self._tail(victim)
+        mid = tail + (e - tail + 1) // 2
+        segs[victim][1] = mid - 1
+        segs.append([mid, e, mid])
+        return len(segs) - 1
+
+    def release(self, i):
+        with self.journal.lock: self.active.pop(i, None); self.writers.pop(i, None)
+
+    def requeue(self, i):
+        """מחזיר מקטע לתור - ימשיך מההיסט שבו עצר"""
+        with self.journal.lock:
+            self.active.pop(i, None); self.writers.pop(i, None)
+            if i not in self.pending: self.pending.append(i)
+
+    def stop(self):
+        with self.journal.lock: self.stopped = True
+
+
+# ─── Mirrors ──────────────────────────────────────────────────────────────────
+
+class MirrorSet:
+    """כמה כתובות לאותו תוכן. כל מקטע הולך למראה עם הכי הרבה קצב פנוי (קצב נמדד חלקי חיבורים פעילים);
+    מראה שנכשל באמצע טווח יוצא מהסבב לזמן הולך וגדל, והמקטע חוזר לתור וממשיך מאותו היסט במראה אחר"""
+    COOLDOWN = 10.0
+    MAX_FAILS = 3
+    ALPHA = 0.3  # משקל המדידה האחרונה בממוצע הנע של הקצב
+
+    def __init__(self, urls):
+        self.urls = list(dict.fromkeys(urls))
+        self.stats = {u: {"rate": 0.0, "active": 0, "fails": 0, "until": 0.0} for u in self.urls}
+        self.rejected = []
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def matches(info, other):
+        """מראה תקף רק אם הגודל זהה, יש תמיכה ב-Range, וה-ETag זהה כשלשניהם יש ETag חזק"""
+        if other["total"] != info["total"] or not other["supports_range"]: return False
+        a, b = info.get("etag"), other.get("etag")
+        if a and b and not a.startswith("W/") and not b.startswith("W/"): return a == b
+        return True
+
+    @classmethod
+    def verified(cls, url, info, mirrors, infos):
+        ms = cls([url])
+        for m, mi in zip(mirrors, infos):
+            if m in ms.stats: continue
+            if cls.matches(info, mi):
+                ms.urls.append(m)
+                ms.stats[m] = {"rate": 0.0, "active": 0, "fails": 0, "until": 0.0}
+            else:
+                ms.rejected.append(m)
+        return ms
+
+    def __len__(self):
+        return len(self.urls)
+
+    def alive(self):
+        return any(st["fails"] < self.MAX_FAILS for st in self.stats.values())
+
+    def ready_in(self):
+        """כמה שניות עד שמראה חי כלשהו יוצא מ-cooldown; 0 כשיש מראה מוכן עכשיו"""
+        now = time.time()
+        with self._lock:
+            waits = [st["until"] - now for st in self.stats.values() if st["fails"] < self.MAX_FAILS]
+        return max(0.0, min(waits, default=0.0))
+
+    def pick(self):
+        now = time.time()
+        with self._lock:
+            alive = [u for u in self.urls if self.stats[u]["fails"] < self.MAX_FAILS]
+            if not alive: return None
+            ready = [u for u in alive if self.stats[u]["until"] <= now] or alive
+
+            def score(u):
+                st = self.stats[u]
+                # מראה שעוד לא נמדד מקבל עדיפות, כדי שיהיה לו קצב להשוות אליו
+                return (not st["rate"] and not st["active"], st["rate"] / (st["active"] + 1), -st["active"])
+            url = max(ready, key=score)
+            self.stats[url]["active"] += 1
+            return url
+
+    def done(self, url, nbytes, seconds):
+        with self._lock:
+            st = self.stats[url]
+            st["active"] -= 1
+            if nbytes and seconds > 0:
+                rate = nbytes / seconds
+                st["rate"] = rate if not st["rate"] else (1 - self.ALPHA) * st["rate"] + self.ALPHA * rate
+                st["fails"] = 0
+
+    def failed(self, url, progressed=False):
+        with self._lock:
+            st = self.stats[url]
+            st["active"] -= 1
+            now = time.time()
+            # חיבורים שנפלו יחד עם הראשון, בזמן ה-cooldown שלו, הם אותה תקלה - לא סופרים אותם שוב
+            if st["until"] > now and not progressed: return
+            st["fails"] = 1 if progressed else st["fails"] + 1
+            st["until"] = now + self.COOLDOWN * st["fails"]
+
+
+# ─── Connection Tuner ─────────────────────────────────────────────────────────
+
+SMALL_FILE = 2 * 1024 * 1024  # מתחת לזה GET יחיד מהיר יותר מפיצול
+
+
+def single_stream(info):
+    """האם ההורדה תרד ב-GET יחיד: שרת בלי Range, או קובץ קטן או שגודלו לא ידוע"""
+    return not (info["supports_range"] and info["total"] >= SMALL_FILE)
+
+
+def queue_connections(info, threads):
+    """כמה חיבורים לבקש מהתור: GET יחיד מחזיק אחד, ו-threads=0 (אוטו) מבקש עד התקרה של הכיוונון"""
+    if info and single_stream(info): return 1
+    return threads or ConnectionTuner.MAX
+
+
+class ConnectionTuner:
+    """מצב חוטים אוטומטי: מתחיל בכמה חיבורים, מוסיף חיבור כל עוד הוא מעלה את הקצב המצטבר,
+    ומוריד חיבור כשהשרת מגביל (429/503) או מחזיר שגיאות"""
+    START, MAX = 2, 8  # התקרה היא גם מה שמבקשים מהתור, כמו ברירת המחדל של חיבורים למארח
+    INTERVAL = 2.0
+    MIN_GAIN = 0.25  # חיבור חדש צריך להוסיף לפחות רבע מהקצב הממוצע של חיבור קיים
+    THROTTLE_STATUSES = (429, 503)
+
+    def __init__(self, limit=MAX):
+        self.limit = max(1, limit)
+        self.target = min(self.START, self.limit)
+        self.growing = True
+        self._rate = 0.0
+        self._t, self._bytes = None, 0
+
+    def sample(self, downloaded, now=None):
+        now = now or time.time()
+        if self._t is None:
+            self._t, self._bytes = now, downloaded; return self.target
+        if now - self._t < self.INTERVAL: return self.target
+        rate = (downloaded - self._bytes) / (now - self._t)
+        self._t, self._bytes = now, downloaded
+        per_conn = self._rate / max(self.target - 1, 1)
+        if self.growing:
+            if not self._rate or rate >= self._rate + self.MIN_GAIN * per_conn:
+                self._rate = rate
+                if self.target < self.limit: self.target += 1
+            else:
+                # החיבור האחרון לא שיפר - מחזירים אותו ומפסיקים לגדול
+                self.target, self.growing = max(1, self.target - 1), False
+        elif rate > self._rate:
+            self._rate = rate
+        return self.target
+
+    def throttled(self):
+        self.target, self.growing = max(1, self.target - 1), False
+
+    def restart(self):
+        """אחרי הפסקה - המדידה הבאה מתחילה מחדש ולא כוללת את זמן ההמתנה"""
+        self._t = None
+
+
+# ─── Telemetry ────────────────────────────────────────────────────────────────
+
+class SegmentStats:
+    """מדדי מקטע אחד. נכתבים רק מהחוט שמחזיק את המקטע, והמוניטור רק קורא אותם"""
+    __slots__ = ("url", "bytes", "by_url", "speed", "ewma", "retries", "ttfb", "active", "_t0", "_mark")
+
+    def __init__(self):
+        self.url, self.bytes, self.by_url = None, 0, {}
+        self.speed = self.ewma = 0.0
+        self.retries, self.ttfb, self.active = 0, None, False
+        self._t0, self._mark = 0.0, 0
+
+    def begin(self, url):
+        """בקשה חדשה יוצאת - ממנה נמדד הזמן עד הבית הראשון"""
+        self.url, self.active, self.ttfb, self._t0 = url, True, None, time.perf_counter()
+        self.by_url.setdefault(url, 0)
+
+    def received(self, n):
+        if self.ttfb is None: self.ttfb = time.perf_counter() - self._t0
+        self.bytes += n
+        self.by_url[self.url] += n
+
+    def end(self): self.active = False
+
+
+class Telemetry:
+    """מדדי קצב חיים להורדה אחת: לכל מקטע ובסך הכל - בתים, קצב רגעי ו-EWMA, ניסיונות חוזרים ו-TTFB.
+    המוניטור קורא ל-tick() בכל דגימה, וה-ETA מחושב מהקצב המוחלק ולא מהדגימה האחרונה.
+    snapshot() מחזיר dict שאפשר לכתוב כ-JSON, מכל חוט"""
+    ALPHA = 0.3  # משקל הדגימה החדשה ב-EWMA
+
+    def __init__(self):
+        self.total = self.done = 0
+        self.speed = self.ewma = 0.0
+        self.segments = {}
+        self._lock = threading.Lock()
+        self._t, self._mark, self._base = None, 0, 0
+
+    def start(self, total, done=0):
+        self.total, self.done, self._mark, self._t, self._base = total, done, done, time.time(), done
+
+    def received(self):
+        """בתים שהתקבלו עד עכשיו, כולל מה שעוד ממתין בבאפר לכתיבה - לפיהם מדווחים התקדמות וקצב"""
+        with self._lock: stats = list(self.segments.values())
+        return self._base + sum(st.bytes for st in stats)
+
+    def segment(self, i):
+        st = self.segments.get(i)
+        if st is None:
+            with self._lock: st = self.segments.setdefault(i, SegmentStats())
+        return st
+
+    def _smooth(self, old, new):
+        return new if not old else old + self.ALPHA * (new - old)
+
+    def tick(self, done, now=None):
+        """דגימה: מעדכן קצב רגעי ו-EWMA לכל מקטע ולסך הכל; מחזיר (speed, eta)"""
+        now = now or time.time()
+        with self._lock: stats = list(self.segments.values())
+        dt = now - self._t if self._t is not None else 0
+        if dt > 0:
+            self.speed = (done - self._mark) / dt
+            self.ewma = self._smooth(self.ewma, self.speed)
+        for st in stats:
+            if dt > 0:
+                st.speed = (st.bytes - st._mark) / dt
+                st.ewma = self._smooth(st.ewma, st.speed)
+            st._mark = st.bytes
+        self._t, self._mark, self.done = now, done, done
+        return self.speed, self.eta()
+
+    def restart(self):
+        """אחרי הפסקה - הדגימה הבאה רק מסמנת נקודת התחלה, בלי זמן ההמתנה"""
+        self._t = None
+        self.speed = 0.0
+
+    def eta(self):
+        return (self.total - self.done) / self.ewma if self.ewma > 0 and self.total else 0
+
+    def snapshot(self):
+        with self._lock: items = sorted(self.segments.items())
+        segs, urls = [], {}
+        for i, st in items:
+            segs.append({"segment": i, "url": st.url, "bytes": st.bytes, "speed": round(st.speed),
+                         "ewma": round(st.ewma), "retries": st.retries,
+                         "ttfb": None if st.ttfb is None else round(st.ttfb, 4), "active": st.active})
+            for url, n in list(st.by_url.items()):
+                u = urls.setdefault(url, {"bytes": 0, "ewma": 0, "connections": 0, "retries": 0})
+                u["bytes"] += n
+            if st.url:
+                u = urls[st.url]
+                u["retries"] += st.retries
+                if st.active: u["ewma"] += round(st.ewma); u["connections"] += 1
+        return {"downloaded": self.done, "total": self.total, "speed": round(self.speed),
+                "ewma": round(self.ewma), "eta": round(self.eta(), 1),
+                "retries": sum(s["retries"] for s in segs), "urls": urls, "segments": segs}
+
+
+def prometheus_text(downloads):
+    """{id: snapshot} בפורמט הטקסט של Prometheus"""
+    lines = []
+    for did, snap in downloads.items():
+        dl = f'id="{did}"'
+        lines += [f'pydown_downloaded_bytes{{{dl}}} {snap["downloaded"]}',
+                  f'pydown_total_bytes{{{dl}}} {snap["total"]}',
+                  f'pydown_speed_bytes{{{dl}}} {snap["speed"]}',
+                  f'pydown_speed_ewma_bytes{{{dl}}} {snap["ewma"]}',
+                  f'pydown_eta_seconds{{{dl}}} {snap["eta"]}']
+        for seg in snap["segments"]:
+            url = (seg["url"] or "").replace("\\", "\\\\").replace('"', '\\"')
+            lbl = f'{dl},segment="{seg["segment"]}",url="{url}"'
+            lines += [f'pydown_segment_bytes{{{lbl}}} {seg["bytes"]}',
+                      f'pydown_segment_speed_ewma_bytes{{{lbl}}} {seg["ewma"]}',
+                      f'pydown_segment_retries_total{{{lbl}}} {seg["retries"]}']
+            if seg["ttfb"] is not None: lines.append(f'pydown_segment_ttfb_seconds{{{lbl}}} {seg["ttfb"]}')
+    return "\n".join(lines) + "\n"
+
+
+def dump_metrics(path, downloads):
+    """כותב {id: snapshot} כ-JSON בהחלפה אטומית, כך שקורא חיצוני לא רואה קובץ חצוי"""
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(downloads, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+class MetricsServer:
+    """נקודת מדדים מקומית: GET / מחזיר JSON, ו-GET /metrics את אותם נתונים בפורמט Prometheus.
+    source היא פונקציה שמחזירה {id: snapshot}; port=0 בוחר פורט פנוי"""
+
+    def __init__(self, port, source, host="127.0.0.1"):
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                data = source()
+                if self.path.rstrip("/") == "/metrics":
+                    body, ctype = prometheus_text(data).encode(), "text/plain; version=0.0.4"
+                else:
+                    body, ctype = json.dumps(data, ensure_ascii=False).encode(), "application/json"
+                self.send_response(200)
+                self.send_header("Content-Type", ctype)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *a): pass
+
+        self.httpd = http.server.ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self.port = self.httpd.server_address[1]
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.httpd.shutdown(); self.httpd.server_close()
+
+
+# ─── Download Queue ───────────────────────────────────────────────────────────
+
+class DownloadQueue:
+    """תור הורדות גלובלי - מגביל הורדות פעילות וחיבורים, בסך הכל ולכל מארח, לפי עדיפות"""
+
+    def __init__(self, max_active=3, max_connections=32, max_per_host=8):
+        self.max_active = max_active
+        self.max_connections = max_connections
+        self.max_per_host = max_per_host
+        self._heap = []      # (-priority, seq, key)
+        self._queued = {}    # key -> [item, host, threads, priority, seq]
+        self._active = {}    # key -> (host, connections)
+        self._host_conns = {}
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+
+    def pool_size(self):
+        """כמה חיבורים לשמור לכל מארח: כל מה שהתור מרשה למארח אחד, ועוד אחד ל-HEAD"""
+        return min(self.max_per_host, self.max_connections) + 1
+
+    def add(self, item, url, threads, priority=0):
+        with self._lock:
+            seq = next(self._seq)
+            self._queued[id(item)] = [item, urlparse(url).netloc, threads, priority, seq]
+            heapq.heappush(self._heap, (-priority, seq, id(item)))
+
+    def set_priority(self, item, priority):
+        with self._lock:
+            q = self._queued.get(id(item))
+            if not q: return
+            q[3], q[4] = priority, next(self._seq)
+            heapq.heappush(self._heap, (-priority, q[4], id(item)))
+
+    def priority(self, item):
+        q = self._queued.get(id(item))
+        return q[3] if q else 0
+
+    def is_queued(self, item):
+        return id(item) in self._queued
+
+    def remove(self, item):
+        with self._lock:
+            self._queued.pop(id(item), None)
+        self.release(item)
+
+    def release(self, item):
+        with self._lock:
+            a = self._active.pop(id(item), None)
+            if a:
+                host, n = a
+                self._host_conns[host] -= n
+                if not self._host_conns[host]: del self._host_conns[host]
+
+    def connections(self):
+        return sum(n for _, n in self._active.values())
+
+    def take(self):
+        """מחזיר [(item, חוטים)] של הורדות שאפשר להתחיל עכשיו; מארח מלא לא חוסם מארחים אחרים"""
+        started, skipped = [], []
+        with self._lock:
+            used = sum(n for _, n in self._active.values())
+            while self._heap and len(self._active) < self.max_active and used < self.max_connections:
+                entry = heapq.heappop(self._heap)
+                q = self._queued.get(entry[2])
+                if not q or q[4] != entry[1]: continue  # רשומה ישנה אחרי שינוי עדיפות/הסרה
+                item, host, threads = q[:3]
+                free = min(self.max_connections - used, self.max_per_host - self._host_conns.get(host, 0))
+                if free <= 0:
+                    skipped.append(entry); continue
+                n = min(threads, free)
+                del self._queued[entry[2]]
+                self._active[entry[2]] = (host, n)
+                self._host_conns[host] = self._host_conns.get(host, 0) + n
+                used += n
+                started.append((item, n))
+            for entry in skipped: heapq.heappush(self._heap, entry)
+        return started
+
+# ─── Download History ─────────────────────────────────────────────────────────
+
+PYDOWN_HOME = os.environ.get("PYDOWN_HOME") or os.path.join(os.path.expanduser("~"), ".pydown")
+
+HISTORY_SCHEMA = """
+CREATE TABLE IF NOT EXISTS downloads (
+    id          INTEGER PRIMARY KEY,
+    url         TEXT NOT NULL,
+    filename    TEXT NOT NULL,
+    save_path   TEXT NOT NULL,
+    size        INTEGER NOT NULL DEFAULT 0,
+    threads     INTEGER NOT NULL DEFAULT 8,
+    rate_limit  INTEGER NOT NULL DEFAULT 0,
+    checksum    TEXT,
+    mirrors     TEXT,
+    cache       INTEGER NOT NULL DEFAULT 0,
+    status      TEXT NOT NULL,
+    message     TEXT,
+    added       REAL NOT NULL,
+    started     REAL,
+    finished    REAL,
+    duration    REAL,
+    avg_speed   REAL,
+    peak_speed  REAL
+);
+CREATE INDEX IF NOT EXISTS ix_downloads_added  ON downloads(added);
+CREATE INDEX IF NOT EXISTS ix_downloads_status ON downloads(status);
+CREATE INDEX IF NOT EXISTS ix_downloads_url    ON downloads(url);
+"""
+
+# עמודות שנוספו אחרי הגרסה הראשונה - מתווספות למסד קיים ב-ALTER TABLE
+HISTORY_MIGRATIONS = (("mirrors", "TEXT"), ("cache", "INTEGER NOT NULL DEFAULT 0"))
+
+HISTORY_FTS = """
+CREATE VIRTUAL TABLE IF NOT EXISTS downloads_fts USING fts5(
+    filename, url, content='downloads', content_rowid='id');
+CREATE TRIGGER IF NOT EXISTS downloads_ai AFTER INSERT ON downloads BEGIN
+    INSERT INTO downloads_fts(rowid, filename, url) VALUES (new.id, new.filename, new.url);
+END;
+CREATE TRIGGER IF NOT EXISTS downloads_ad AFTER DELETE ON downloads BEGIN
+    INSERT INTO downloads_fts(downloads_fts, rowid, filename, url) VALUES ('delete', old.id, old.filename, old.url);
+END;
+CREATE TRIGGER IF NOT EXISTS downloads_au AFTER UPDATE OF filename, url ON downloads BEGIN
+    INSERT INTO downloads_fts(downloads_fts, rowid, filename, url) VALUES ('delete', old.id, old.filename, old.url);
+    INSERT INTO downloads_fts(rowid, filename, url) VALUES (new.id, new.filename, new.url);
+END;
+"""
+
+
+class DownloadHistory:
+    """היסטוריית הורדות ב-SQLite - נשמרת בין הפעלות, עם אינדקסים וחיפוש FTS5 בשם ובכתובת"""
+    RESUMABLE = ("ממתין", "מוריד", "מושהה", "מאמת")
+    COLUMNS = ("url", "filename", "save_path", "size", "threads", "rate_limit", "checksum", "mirrors", "cache",
+               "status", "message", "started", "finished", "duration", "avg_speed", "peak_speed")
+
+    def __init__(self, path=None):
+        path = path or os.path.join(PYDOWN_HOME, "history.db")
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("PRAGMA journal_mode=WAL")
+        with self.db:
+            self.db.executescript(HISTORY_SCHEMA)
+            have = {r["name"] for r in self.db.execute("PRAGMA table_info(downloads)")}
+            for col, decl in HISTORY_MIGRATIONS:
+                if col not in have: self.db.execute(f"ALTER TABLE downloads ADD COLUMN {col} {decl}")
+        try:
+            with self.db:
+                self.db.executescript(HISTORY_FTS)
+            self.fts = True
+        except sqlite3.OperationalError:  # SQLite בלי FTS5 - חיפוש LIKE
+            self.fts = False
+
+    def add(self, url, filename, save_path, threads=8, rate_limit=0, checksum=None, status="ממתין", mirrors=(),
+            cache=False):
+        with self._lock, self.db:
+            cur = self.db.execute(
+                "INSERT INTO downloads (url, filename, save_path, threads, rate_limit, checksum, mirrors, cache,"
+                " status, added) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, filename, save_path, threads, rate_limit, checksum, " ".join(mirrors) or None,
+                 int(bool(cache)), status, time.time()))
+            return cur.lastrowid
+
+    def update(self, hid, **fields):
+        fields = {k: v for k, v in fields.items() if k in self.COLUMNS}
+        if not fields: return
+        with self._lock, self.db:
+            self.db.execute(f"UPDATE downloads SET {', '.join(f'{k} = ?' for k in fields)} WHERE id = ?",
+                            (*fields.values(), hid))
+
+    def finish(self, hid, status, message, size, started, base_bytes=0, peak=0.0):
+        """סוגר רשומה: משך, קצב ממוצע (על הבתים שירדו בהרצה הזו) וקצב שיא"""
+        now = time.time()
+        duration = now - started if started else None
+        avg = (size - base_bytes) / duration if duration and size > base_bytes else 0.0
+        self.update(hid, status=status, message=message, size=size, finished=now,
+                    duration=duration, avg_speed=avg, peak_speed=peak)
+
+    def get(self, hid):
+        with self._lock:
+            return self.db.execute("SELECT * FROM downloads WHERE id = ?", (hid,)).fetchone()
+
+    def unfinished(self):
+        with self._lock:
+            return self.db.execute(
+                f"SELECT * FROM downloads WHERE status IN ({','.join('?' * len(self.RESUMABLE))}) ORDER BY id",
+                self.RESUMABLE).fetchall()
+
+    def search(self, text="", limit=200):
+        words = text.split()
+        with self._lock:
+            if not words:
+                return self.db.execute("SELECT * FROM downloads ORDER BY added DESC LIMIT ?", (limit,)).fetchall()
+            if self.fts:
+                query = " ".join('"{}"*'.format(w.replace('"', '""')) for w in words)
+                return self.db.execute(
+                    "SELECT d.* FROM downloads_fts f JOIN downloads d ON d.id = f.rowid"
+                    " WHERE downloads_fts MATCH ? ORDER BY d.added DESC LIMIT ?", (query, limit)).fetchall()
+            like = " AND ".join("(filename LIKE ? OR url LIKE ?)" for _ in words)
+            args = [a for w in words for a in (f"%{w}%", f"%{w}%")]
+            return self.db.execute(f"SELECT * FROM downloads WHERE {like} ORDER BY added DESC LIMIT ?",
+                                   (*args, limit)).fetchall()
+
+    def close(self):
+        with self._lock: self.db.close()
+
+
+# ─── Download Cache ───────────────────────────────────────────────────────────
+
+CACHE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache (
+    url           TEXT PRIMARY KEY,
+    path          TEXT NOT NULL,
+    size          INTEGER NOT NULL,
+    sha256        TEXT NOT NULL,
+    etag          TEXT,
+    last_modified TEXT,
+    fetched       REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_cache_sha256 ON cache(sha256);
+"""
+
+
+class DownloadCache:
+    """אינדקס מקומי לפי כתובת - ETag, Last-Modified ו-sha256 של מה שהורד (אופציונלי).
+    הורדה חוזרת שולחת בקשה מותנית ומדלגת על ההעברה ב-304; תוכן זהה בשמות שונים נשמר פעם אחת (hardlink)"""
+    UNCHANGED = "לא השתנה"
+
+    def __init__(self, path=None):
+        path = path or os.path.join(PYDOWN_HOME, "cache.db")
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("PRAGMA journal_mode=WAL")
+        with self.db:
+            self.db.executescript(CACHE_SCHEMA)
+
+    def get(self, url):
+        with self._lock:
+            return self.db.execute("SELECT * FROM cache WHERE url = ?", (url,)).fetchone()
+
+    @staticmethod
+    def intact(entry):
+        """הקובץ עדיין שם ובגודל שנרשם - אחרת אין מה לאמת מול השרת"""
+        try:
+            return os.path.getsize(entry["path"]) == entry["size"]
+        except OSError:
+            return False
+
+    def path_for(self, url, save_dir):
+        """הנתיב שבו הכתובת כבר נשמרה בתיקייה הזו, כדי שסנכרון חוזר לא ייצור file_1.ext"""
+        e = self.get(url)
+        if e and os.path.dirname(e["path"]) == os.path.abspath(save_dir) and self.intact(e): return e["path"]
+        return None
+
+    @staticmethod
+    def conditional_headers(entry):
+        headers = {}
+        if entry["etag"]: headers["If-None-Match"] = entry["etag"]
+        if entry["last_modified"]: headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    @staticmethod
+    def unchanged(entry, status, headers):
+        if status == 304: return True
+        # שרת שמתעלם מבקשות מותנות - משווים בעצמנו
+        if status != 200: return False
+        if entry["etag"]: return headers.get("etag") == entry["etag"]
+        return bool(entry["last_modified"]) and headers.get("last-modified") == entry["last_modified"]
+
+    def fresh(self, url, timeout=15):
+        """הרשומה במטמון אם השרת מאשר שהתוכן לא השתנה, אחרת None"""
+        e = self.get(url)
+        if not e or not self.intact(e): return None
+        headers = self.conditional_headers(e)
+        if not headers: return None
+        try:
+            r = SESSIONS.get(url).head(url, headers=headers, allow_redirects=True, timeout=timeout)
+        except requests.RequestException:
+            return None
+        return e if self.unchanged(e, r.status_code, r.headers) else None
+
+    def store(self, url, path, size, sha256, etag=None, last_modified=None):
+        with self._lock, self.db:
+            self.db.execute(
+                "INSERT OR REPLACE INTO cache (url, path, size, sha256, etag, last_modified, fetched)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (url, os.path.abspath(path), size, sha256, etag, last_modified, time.time()))
+
+    def twin(self, sha256, size, path):
+        """קובץ אחר במטמון עם אותו תוכן, או None"""
+        path = os.path.abspath(path)
+        with self._lock:
+            rows = self.db.execute("SELECT * FROM cache WHERE sha256 = ? AND size = ? AND path != ?",
+                                   (sha256, size, path)).fetchall()
+        for r in rows:
+            if self.intact(r) and not os.path.samefile(r["path"], path): return r["path"]
+        return None
+
+    @staticmethod
+    def place(src, dst):
+        """dst מצביע לאותו תוכן כמו src - hardlink כשאפשר, אחרת העתקה; מחליף את dst באופן אטומי"""
+        if os.path.exists(dst) and os.path.samefile(src, dst): return
+        tmp = dst + ".pydown-tmp"
+        try:
+            os.link(src, tmp)
+        except OSError:
+            shutil.copyfile(src, tmp)
+        os.replace(tmp, dst)
+
+    @staticmethod
+    def unshare(path):
+        """קובץ שמשותף ב-hardlink לא נכתב במקום - אחרת גם השם השני היה משתנה"""
+        try:
+            if os.stat(path).st_nlink > 1: os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def remember(self, url, path, size, digest, info=None):
+        """רושם הורדה שהושלמה ומאחד אותה עם קובץ זהה שכבר קיים; מחזיר את הקובץ שאליו אוחדה"""
+        info = info or {}
+        if digest is None:
+            h = StreamHasher("sha256", None, path); h.catch_up(size); digest = h.hexdigest()
+        twin = self.twin(digest, size, path)
+        if twin: self.place(twin, path)
+        self.store(url, path, size, digest, info.get("etag"), info.get("last_modified"))
+        return twin
+
+    def close(self):
+        with self._lock: self.db.close()
+
+
+# ─── Downloader ───────────────────────────────────────────────────────────────
+
+class DownloadBase:
+    """מה שמשותף ל-Downloader ול-AsyncDownload: מצב, יומן, ההחלטה אחרי כישלון ואימות בסיום.
+    המתודות כאן חוסמות (דיסק, hash) - המנוע האסינכרוני מריץ אותן ב-executor"""
+
+    def __init__(self, url, save_path, threads=8, preallocate=True, info=None,
+                 on_progress=None, on_finished=None, on_status=None, rate_limit=0, checksum=None,
+                 auto=False, mirrors=(), cache=None, chunk_size=READ_SIZE):
+        self.url = url
+        self.save_path = save_path
+        self.num_threads = threads
+        self.preallocate = preallocate
+        self.info = info
+        self.on_progress = on_progress or (lambda *a: None)
+        self.on_finished = on_finished or (lambda *a: None)  # (ok, msg, status)
+        self.on_status = on_status or (lambda *a: None)
+        self._cancel = False
+        self._lock = threading.Lock()
+        self._bucket = TokenBucket(rate_limit)
+        self.checksum = checksum
+        self._hasher = None
+        self.auto = auto
+        self.mirrors = list(mirrors)
+        self.cache = cache
+        self.chunk_size = chunk_size
+        self.telemetry = Telemetry()
+
+    def set_rate_limit(self, rate): self._bucket.set_rate(rate)
+
+    def _single_progress(self):
+        """דיווח להורדה רציפה, שאין לה מוניטור: נקרא אחרי כל קריאה, ומדווח לכל היותר פעמיים בשנייה"""
+        last = [time.time()]
+
+        def report():
+            now = time.time()
+            if now - last[0] >= 0.5:
+                done = self.telemetry.received()
+                self.on_progress(done, self.telemetry.total, *self.telemetry.tick(done, now))
+                last[0] = now
+        return report
+
+    def _create(self):
+        """פותח את קובץ היעד מחדש להורדה רציפה - רק אחרי שהתשובה נבדקה, כדי ש-404 לא ישאיר קובץ ריק"""
+        return os.open(self.save_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, "O_BINARY", 0), 0o666)
+
+    def _open_journal(self, total):
+        """יומן להורדה מפוצלת: ממשיך מהיומן הקיים אם הוא תואם, אחרת מקצה את הקובץ מחדש"""
+        journal = DownloadJournal(self.save_path)
+        resumed = journal.load(self.url, total) and os.path.exists(self.save_path) \
+            and os.path.getsize(self.save_path) == total
+        if not resumed:
+            journal.reset(self.url, total, SegmentScheduler.initial_ranges(total, self.num_threads))
+            allocate_file(self.save_path, total, self.preallocate)
+        journal.save()
+        self.telemetry.start(total, journal.done())
+        return journal
+
+    def _flushed(self, journal, i):
+        def on_flush(pos, data):
+            if self._hasher: self._hasher.feed(pos, data)
+            journal.advance(i, len(data))
+        return on_flush
+
+    def _after_failure(self, ex, i, url, pos0, attempt, journal, sched, mirrors, tuner):
+        """ההחלטה אחרי בקשה שנכשלה: (attempt, delay) - delay הוא None אם המקטע הוחזר לתור
+        (מראה אחר או פחות חיבורים). שגיאה שאין טעם לנסות שוב נזרקת"""
+        self.telemetry.segment(i).retries += 1
+        progressed = journal.segments[i][2] > pos0
+        if mirrors and url: mirrors.failed(url, progressed)
+        if tuner and http_status(ex) in tuner.THROTTLE_STATUSES and tuner.target > 1:
+            tuner.throttled(); sched.requeue(i); return attempt, None
+        if mirrors and url and (http_status(ex) or RetryPolicy.retryable(ex)) and mirrors.alive() \
+                and not mirrors.ready_in():
+            sched.requeue(i); return attempt, None  # ממשיכים את הטווח ממראה אחר
+        # כל המראות ב-cooldown: backoff רגיל, ו-fetch ממתין עד שאחד מהם מתפנה
+        if progressed: attempt = 0  # המקטע התקדם - זו תקלה חדשה ולא אותה אחת
+        if not RetryPolicy.retryable(ex) or attempt >= RetryPolicy.ATTEMPTS: raise ex
+        return attempt + 1, RetryPolicy.delay(attempt)
+
+    def _finish(self, status, msg=None):
+        self.on_finished(status in (DONE, VERIFIED), msg or status, status)
+
+    def _multi_outcome(self, journal, total, errors):
+        """סוף הורדה מפוצלת: (מצב, הודעה) של כישלון, או None כשכל הטווחים ירדו (ורק אז היומן נמחק)"""
+        journal.save()
+        if self._cancel: return CANCELLED, None
+        if errors: return FAILED, errors[0]
+        if journal.frontier() < total:
+            return FAILED, f"ההורדה לא הושלמה ({format_size(journal.done())} מתוך {format_size(total)}) - אפשר להמשיך"
+        journal.remove()
+        return None
+
+    def _verify(self, size):
+        """hash סופי ורישום במטמון; מחזיר (מצב, הודעה)"""
+        status, msg = DONE, None
+        if self._hasher:
+            if self._hasher.expected is not None: self.on_status("מאמת")
+            self._hasher.catch_up(size)
+            status, msg = self._hasher.result()
+        if status != CORRUPT and self.cache:
+            digest = self._hasher.hexdigest() if self._hasher.algo == "sha256" else None
+            self.cache.remember(self.url, self.save_path, size, digest, self.info)
+        return status, msg
+
+
+class Downloader(DownloadBase):
+    """מנוע ההורדה מרובה החוטים, בלי Qt - DownloadWorker וה-CLI עוטפים אותו"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._pause = False
+        self._resume_evt = threading.Event()
+        self._resume_evt.set()
+        self._cancel_evt = threading.Event()
+
+    def pause(self):
+        self._pause = True; self._resume_evt.clear()
+
+    def resume(self):
+        self._pause = False; self._resume_evt.set()
+
+    def cancel(self):
+        self._cancel = True; self._cancel_evt.set(); self.resume()
+
+    def _backoff(self, seconds):
+        self._cancel_evt.wait(seconds)
+
+    def _park(self, writer, releasable=True):
+        """חוט בהפסקה ממתין על event (בלי CPU). מה שבבאפר נכתב קודם, כדי שההיסט ביומן יהיה מדויק;
+        אם ההפסקה ארוכה מ-PAUSE_GRACE החיבור משוחרר, וההמשך יהיה בבקשת Range חדשה"""
+        writer.flush()
+        if not self._resume_evt.wait(PAUSE_GRACE if releasable else None):
+            raise ConnectionReleased()
+
+    def _throttle(self, n):
+        delay = max(LIMITER.reserve(n), self._bucket.reserve(n))
+        if delay: time.sleep(delay)
+
+    def run(self):
+        try:
+            self._download()
+        except Exception as e:
+            self._finish(FAILED, str(e))
+
+    def _download(self):
+        info = self.info = self.info or probe(self.url)
+        total = info["total"]
+        if self.cache and self._from_cache(): return
+        if self.checksum:
+            self._hasher = StreamHasher(*resolve_checksum(self.checksum), self.save_path)
+        elif self.cache:
+            self._hasher = StreamHasher("sha256", None, self.save_path)
+
+        self.on_status("מוריד")
+
+        if single_stream(info):
+            self._single(total)
+        else:
+            self._multi(total)
+
+    def _single(self, total):
+        # בלי תמיכה ב-Range אי אפשר להמשיך מהיסט, אז בהפסקה החיבור נשאר פתוח
+        releasable = bool(self.info and self.info.get("supports_range"))
+        stat = self.telemetry.segment(0)
+        self.telemetry.start(total)
+        try:
+            writer = None
+            try:
+                while not self._cancel:
+                    pos = writer.pos if writer else 0
+                    headers = {**IDENTITY, 'Range': f'bytes={pos}-'} if pos else IDENTITY
+                    stat.begin(self.url)
+                    with SESSIONS.get(self.url).get(self.url, headers=headers, stream=True, timeout=30) as resp:
+                        resp.raise_for_status()
+                        if pos and resp.status_code != 206:
+                            raise IOError("השרת לא המשיך מההיסט אחרי ההפסקה")
+                        if not total:
+                            total = self.telemetry.total = int(resp.headers.get('content-length', 0))
+                        if writer is None:
+                            writer = BlockWriter(self._create(), 0, WRITE_BLOCK, self._hasher and self._hasher.feed)
+                            report = self._single_progress()
+                        try:
+                            self._receive(raw_readinto(resp), writer, releasable, stat, report)
+                            if not self._cancel: release_body(resp)
+                            break
+                        except ConnectionReleased:
+                            pass
+                        finally:
+                            stat.end()
+                    self._resume_evt.wait()
+                    self.telemetry.restart()
+            finally:
+                if writer: os.close(writer.fd)
+            if self._cancel:
+                self._finish(CANCELLED); return
+            self._complete(writer.pos)
+        except Exception as e:
+            self._finish(FAILED, str(e))
+
+    def _idle(self, journal, total):
+        """המוניטור בהפסקה: מדווח מהירות 0 ונרדם עד החידוש. היומן נשמר אחרי שהחוטים
+        כתבו את הבאפרים שלהם ושחררו את החיבורים"""
+        self.on_progress(self.telemetry.received(), total, 0, 0)
+        if not self._resume_evt.wait(PAUSE_GRACE + 1):
+            journal.save()
+            self._resume_evt.wait()
+
+    def _receive(self, readinto, writer, releasable=True, stat=None, report=None):
+        """לולאת הקבלה: readinto ישירות לבאפר של הכותב, בגודל קריאה אדפטיבי"""
+        sizer = ReadSizer(self.chunk_size)
+        try:
+            while not self._cancel:
+                if self._pause: self._park(writer, releasable)
+                space = writer.room(sizer.size)
+                if not space: return  # סוף הטווח
+                t0 = time.perf_counter()
+                n = readinto(space)
+                if not n:
+                    if writer.end and writer.remaining() > 0:
+                        raise ConnectionError("החיבור נסגר לפני סוף הטווח")
+                    return
+                sizer.update(n, time.perf_counter() - t0)
+                if stat: stat.received(n)
+                writer.commit(n)
+                if report: report()
+                self._throttle(n)
+        finally:
+            writer.flush()
+
+    def _from_cache(self):
+        hit = self.cache.fresh(self.url)
+        if not hit:
+            DownloadCache.unshare(self.save_path)
+            return False
+        DownloadCache.place(hit["path"], self.save_path)
+        self.on_progress(hit["size"], hit["size"], 0, 0)
+        self._finish(DONE, DownloadCache.UNCHANGED)
+        return True
+
+    def _complete(self, size):
+        self._finish(*self._verify(size))
+
+    def _multi(self, total):
+        journal = self._open_journal(total)
+        sched = SegmentScheduler(journal)
+        errors = []
+        tel = self.telemetry
+        mirrors = None
+        if self.mirrors:
+            with concurrent.futures.ThreadPoolExecutor(len(self.mirrors)) as ex:
+                infos = list(ex.map(probe, self.mirrors))
+            mirrors = MirrorSet.verified(self.url, self.info, self.mirrors, infos)
+            if len(mirrors) < 2: mirrors = None
+
+        def dl_chunk(i, url):
+            s, e, pos = journal.segments[i]
+            if pos > e: return
+            headers = {'Range': f'bytes={pos}-{e}', **IDENTITY}
+            stat = tel.segment(i)
+            stat.begin(url)
+            try:
+                with SESSIONS.get(url).get(url, headers=headers, stream=True, timeout=60) as r:
+                    r.raise_for_status()
+                    fd = os.open(self.save_path, os.O_WRONLY | getattr(os, "O_BINARY", 0))
+                    try:
+                        # הסוף נקרא מהיומן בכל קריאה - הוא מתקצר אם חוט אחר גנב את הזנב
+                        writer = BlockWriter(fd, pos, WRITE_BLOCK, self._flushed(journal, i), end=lambda: journal.segments[i][1])
+                        sched.track(i, writer)
+                        self._receive(raw_readinto(r), writer, True, stat)
+                        if not self._cancel: release_body(r)
+                    finally:
+                        os.close(fd)
+            finally:
+                stat.end()
+
+        tuner = ConnectionTuner(self.num_threads) if self.auto else None
+        live = [0]
+
+        def fetch(i):
+            """מוריד מקטע עד סופו; שגיאה חולפת מנוסה שוב מההיסט הנוכחי אחרי backoff"""
+            attempt = 0
+            while not self._cancel:
+                if mirrors and mirrors.ready_in(): self._backoff(mirrors.ready_in())
+                url = mirrors.pick() if mirrors else self.url
+                t0, pos0 = time.time(), journal.segments[i][2]
+                try:
+                    if url is None: raise IOError("כל המראות נכשלו")
+                    dl_chunk(i, url)
+                    if mirrors: mirrors.done(url, journal.segments[i][2] - pos0, time.time() - t0)
+                    return
+                except ConnectionReleased:
+                    # הפסקה ארוכה: החיבור נסגר; בחידוש מתחברים מחדש מההיסט שביומן
+                    if mirrors: mirrors.done(url, 0, 0)
+                    self._resume_evt.wait()
+                    attempt = 0
+                except Exception as ex:
+                    attempt, delay = self._after_failure(ex, i, url, pos0, attempt, journal, sched, mirrors, tuner)
+                    if delay is None: return
+                    self._backoff(delay)
+
+        def dl_loop():
+            try:
+                while not self._cancel:
+                    if tuner and live[0] > tuner.target: return
+                    i = sched.next()
+                    if i is None: return
+                    try:
+                        fetch(i)
+                    except Exception as ex:
+                        errors.append(str(ex) or type(ex).__name__); sched.stop()
+                    finally:
+                        sched.release(i)
+            finally:
+                with self._lock: live[0] -= 1
+
+        def spawn():
+            with self._lock: live[0] += 1
+            t = threading.Thread(target=dl_loop, daemon=True)
+            t.start()
+            return t
+
+        threads = [spawn() for _ in range(tuner.target if tuner else self.num_threads)]
+
+        last_t = time.time()
+        while any(t.is_alive() for t in threads):
+            if self._cancel:
+                for t in threads: t.join(0.1)
+                journal.save()
+                self._finish(CANCELLED); return
+            if self._pause:
+                self._idle(journal, total)
+                last_t = time.time()
+                tel.restart()
+                if tuner: tuner.restart()
+                continue
+            now, curr = time.time(), tel.received()
+            if now - last_t >= 0.5:
+                self.on_progress(curr, total, *tel.tick(curr, now))
+                last_t = now
+                journal.save()
+                if self._hasher: self._hasher.catch_up(journal.frontier())
+            if tuner:
+                target = tuner.sample(curr, now)
+                threads = [t for t in threads if t.is_alive()]
+                for _ in range(target - live[0]): threads.append(spawn())
+            self._cancel_evt.wait(0.2)
+
+        failure = self._multi_outcome(journal, total, errors)
+        if failure:
+            self._finish(*failure); return
+        self._complete(total)
+
+# ─── Async Engine ─────────────────────────────────────────────────────────────
+
+ENGINE = os.environ.get("PYDOWN_ENGINE", "threads")  # "threads" או "async"
+
+
+class AsyncResponse:
+    def __init__(self, http, key, reader, writer, status, reason, headers, body):
+        self._http, self._key = http, key
+        self._reader, self._writer = reader, writer
+        self.status, self.reason, self.headers = status, reason, headers
+        self._body = body        # "length" / "chunked" / "eof" / None
+        self._left = int(headers.get('content-length', 0)) if body == "length" else 0
+        self._done = body is None or (body == "length" and not self._left)
+
+    def raise_for_status(self):
+        if self.status >= 400:
+            raise HTTPStatusError(self.status, self.reason)
+
+    async def iter_content(self, size=65536, timeout=60):
+        r = self._reader
+        if self._body == "length":
+            while self._left:
+                data = await asyncio.wait_for(r.read(min(size, self._left)), timeout)
+                if not data: raise ConnectionError("החיבור נסגר באמצע התשובה")
+                self._left -= len(data)
+                yield data
+        elif self._body == "chunked":
+            while True:
+                n = int((await asyncio.wait_for(r.readline(), timeout)).split(b';')[0], 16)
+                if not n:
+                    while (await asyncio.wait_for(r.readline(), timeout)).strip(): pass
+                    break
+                while n:
+                    data = await asyncio.wait_for(r.read(min(size, n)), timeout)
+                    if not data: raise ConnectionError("החיבור נסגר באמצע התשובה")
+                    n -= len(data)
+                    yield data
+                await asyncio.wait_for(r.readline(), timeout)
+        elif self._body == "eof":
+            while data := await asyncio.wait_for(r.read(size), timeout):
+                yield data
+        self._done = True
+
+    def close(self):
+        keep = self._done and self._body != "eof" \
+            and self.headers.get('connection', '').lower() != 'close'
+        if keep: self._http._release(self._key, self._reader, self._writer)
+        else: self._writer.close()
+
+
+class AsyncHTTP:
+    """לקוח HTTP/1.1 מינימלי מעל asyncio - keep-alive לכל מארח, Range, chunked והפניות"""
+
+    def __init__(self, pool_size=16):
+        self.pool_size = pool_size
+        self._idle = {}  # (scheme, host, port) -> [(reader, writer)]
+        self._ssl = ssl.create_default_context()
+
+    def _release(self, key, reader, writer):
+        idle = self._idle.setdefault(key, [])
+        if len(idle) < self.pool_size: idle.append((reader, writer))
+        else: writer.close()
+
+    async def request(self, method, url, headers=None, timeout=30, redirects=5):
+        for _ in range(redirects + 1):
+            resp = await self._send(method, url, headers or {}, timeout)
+            if resp.status in (301, 302, 303, 307, 308) and 'location' in resp.headers:
+                async for _ in resp.iter_content(): pass
+                resp.close()
+                url = urljoin(url, resp.headers['location']); continue
+            return resp
+        raise IOError("יותר מדי הפניות")
+
+    async def _send(self, method, url, headers, timeout):
+        p = urlparse(url)
+        https = p.scheme == "https"
+        key = (p.scheme, p.hostname, p.port or (443 if https else 80))
+        path = (p.path or "/") + (f"?{p.query}" if p.query else "")
+        lines = [f"{method} {path} HTTP/1.1", f"Host: {p.netloc}", "User-Agent: PyDown",
+                 "Accept-Encoding: identity", "Connection: keep-alive"]
+        lines += [f"{k}: {v}" for k, v in headers.items()]
+        req = ("\r\n".join(lines) + "\r\n\r\n").encode()
+        # חיבור ממתין יכול להיסגר בצד השרת - מנסים שוב על חיבור חדש
+        while True:
+            idle = self._idle.get(key)
+            reused = bool(idle)
+            if reused:
+                reader, writer = idle.pop()
+            else:
+                reader, writer = await asyncio.wait_for(asyncio.open_connection(
+                    key[1], key[2], ssl=self._ssl if https else None), timeout)
+            try:
+                writer.write(req)
+                await writer.drain()
+                status_line = await asyncio.wait_for(reader.readline(), timeout)
+                if not status_line: raise ConnectionError("החיבור נסגר")
+                break
+            except (ConnectionError, OSError):
+                writer.close()
+                if not reused: raise
+        _, status, *reason = status_line.decode('latin-1').split(None, 2)
+        hdrs = {}
+        while (line := await asyncio.wait_for(reader.readline(), timeout)) not in (b"\r\n", b"\n", b""):
+            k, _, v = line.decode('latin-1').partition(":")
+            hdrs[k.strip().lower()] = v.strip()
+        status = int(status)
+        if method == "HEAD" or status in (204, 304) or 100 <= status < 200:
+            body = None
+        elif 'chunked' in hdrs.get('transfer-encoding', '').lower():
+            body = "chunked"
+        elif 'content-length' in hdrs:
+            body = "length"
+        else:
+            body = "eof"
+        return AsyncResponse(self, key, reader, writer, status, reason[0].strip() if reason else "", hdrs, body)
+
+
+class AsyncEngine:
+    """לולאת asyncio אחת בחוט רקע שמריצה את כל ההורדות וכל המקטעים"""
+    _shared = None
+
+    def __init__(self, pool_size=16):
+        self.loop = asyncio.new_event_loop()
+        self.http = AsyncHTTP(pool_size)
+        threading.Thread(target=self.loop.run_forever, daemon=True).start()
+
+    @classmethod
+    def shared(cls):
+        if cls._shared is None: cls._shared = cls(SESSIONS.pool_size)
+        return cls._shared
+
+    def submit(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def call(self, fn, *args):
+        self.loop.call_soon_threadsafe(fn, *args)
+
+
+class AsyncDownload(DownloadBase):
+    """הורדה אחת על גבי AsyncEngine - אותו יומן ואותו מתזמן מקטעים, בלי חוט לכל מקטע.
+    עבודת דיסק (הקצאה, pwrite של בלוקים, hash) רצה ב-executor כדי לא לעצור את הלולאה"""
+
+    def __init__(self, engine, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.engine = engine
+        self._paused = False
+        self._resume_evt = None
+        self._cancel_evt = None
+
+    def pause(self):  self._paused = True;  self.engine.call(self._sync_pause)
+    def resume(self): self._paused = False; self.engine.call(self._sync_pause)
+    def cancel(self): self._cancel = True;  self.resume(); self.engine.call(self._sync_cancel)
+
+    async def _backoff(self, seconds):
+        try:
+            await asyncio.wait_for(self._cancel_evt.wait(), seconds)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _throttle(self, n):
+        delay = max(LIMITER.reserve(n), self._bucket.reserve(n))
+        if delay: await asyncio.sleep(delay)
+
+    def _sync_pause(self):
+        if self._resume_evt is None: return
+        if self._paused: self._resume_evt.clear()
+        else: self._resume_evt.set()
+
+    def _sync_cancel(self):
+        if self._cancel_evt is not None and self._cancel: self._cancel_evt.set()
+
+    async def _gate(self):
+        if not self._resume_evt.is_set(): await self._resume_evt.wait()
+
+    async def _park(self, writer, releasable=True):
+        await asyncio.get_running_loop().run_in_executor(None, writer.flush)
+        try:
+            await asyncio.wait_for(self._resume_evt.wait(), PAUSE_GRACE if releasable else None)
+        except asyncio.TimeoutError:
+            raise ConnectionReleased()
+
+    async def _idle(self, journal, total):
+        self.on_progress(self.telemetry.received(), total, 0, 0)
+        try:
+            await asyncio.wait_for(self._resume_evt.wait(), PAUSE_GRACE + 1)
+        except asyncio.TimeoutError:
+            journal.save()
+            await self._gate()
+
+    async def run(self):
+        self._resume_evt = asyncio.Event()
+        self._cancel_evt = asyncio.Event()
+        self._sync_pause()
+        self._sync_cancel()
+        try:
+            await self._download()
+        except Exception as e:
+            self._finish(FAILED, str(e))
+
+    async def _probe(self, url=None):
+        url = url or self.url
+        try:
+            resp = await self.engine.http.request("HEAD", url, timeout=15)
+            resp.close()
+            return {"total": int(resp.headers.get('content-length', 0)),
+                    "supports_range": 'bytes' in resp.headers.get('accept-ranges', ''),
+                    "filename": get_filename(url, resp.headers),
+                    "etag": resp.headers.get('etag'),
+                    "last_modified": resp.headers.get('last-modified')}
+        except Exception:
+            return {"total": 0, "supports_range": False, "filename": get_filename(url)}
+
+    async def _download(self):
+        info = self.info = self.info or await self._probe()
+        total = info["total"]
+        if self.cache and await self._from_cache(): return
+        if self.checksum:
+            algo, value = await asyncio.get_running_loop().run_in_executor(None, resolve_checksum, self.checksum)
+            self._hasher = StreamHasher(algo, value, self.save_path)
+        elif self.cache:
+            self._hasher = StreamHasher("sha256", None, self.save_path)
+        self.on_status("מוריד")
+        if single_stream(info):
+            await self._single(total)
+        else:
+            await self._multi(total)
+
+    async def _single(self, total):
+        releasable = bool(self.info and self.info.get("supports_range"))
+        stat = self.telemetry.segment(0)
+        self.telemetry.start(total)
+        loop = asyncio.get_running_loop()
+        writer = None
+        try:
+            while not self._cancel:
+                pos = writer.pos if writer else 0
+                headers = {**IDENTITY, 'Range': f'bytes={pos}-'} if pos else IDENTITY
+                stat.begin(self.url)
+                resp = await self.engine.http.request("GET", self.url, headers)
+                try:
+                    resp.raise_for_status()
+                    if pos and resp.status != 206:
+                        raise IOError("השרת לא המשיך מההיסט אחרי ההפסקה")
+                    if not total:
+                        total = self.telemetry.total = int(resp.headers.get('content-length', 0))
+                    if writer is None:
+                        fd = await loop.run_in_executor(None, self._create)
+                        writer = BlockWriter(fd, 0, WRITE_BLOCK, self._hasher and self._hasher.feed)
+                        report = self._single_progress()
+                    try:
+                        await self._receive(resp, writer, releasable, stat, report); break
+                    except ConnectionReleased:
+                        pass
+                finally:
+                    resp.close()
+                    stat.end()
+                await self._gate()
+                self.telemetry.restart()
+        finally:
+            if writer: os.close(writer.fd)
+        if self._cancel:
+            self._finish(CANCELLED); return
+        await self._complete(writer.pos)
+
+    async def _receive(self, resp, writer, releasable=True, stat=None, report=None):
+        """StreamReader מחזיר מה שכבר הגיע עד chunk_size, כך שאין צורך בגודל אדפטיבי - רק באגרגציה לכתיבה.
+        בלוק מלא נכתב ב-executor; גוף שנגמר לפני סוף הטווח הוא שגיאה חולפת, כמו במנוע החוטים"""
+        loop = asyncio.get_running_loop()
+        try:
+            async for ch in resp.iter_content(self.chunk_size):
+                if self._cancel: return
+                if not self._resume_evt.is_set(): await self._park(writer, releasable)
+                data, taken = memoryview(ch), 0
+                while taken < len(data):
+                    if writer.full: await loop.run_in_executor(None, writer.drain)
+                    n = writer.put(data[taken:])
+                    if not n: break
+                    taken += n
+                if stat: stat.received(taken)
+                if report: report()
+                if taken: await self._throttle(taken)
+                if taken < len(data): return  # הזנב נגנב - השאר שייך למקטע אחר
+            if writer.end and writer.remaining() > 0:
+                raise ConnectionError("החיבור נסגר לפני סוף הטווח")
+        finally:
+            await loop.run_in_executor(None, writer.flush)
+
+    async def _from_cache(self):
+        loop = asyncio.get_running_loop()
+        hit = self.cache.get(self.url)
+        headers = DownloadCache.conditional_headers(hit) if hit and DownloadCache.intact(hit) else None
+        if headers:
+            try:
+                resp = await self.engine.http.request("HEAD", self.url, headers, timeout=15)
+                resp.close()
+                if not DownloadCache.unchanged(hit, resp.status, resp.headers): hit = None
+            except Exception:
+                hit = None
+        if not headers or not hit:
+            DownloadCache.unshare(self.save_path)
+            return False
+        await loop.run_in_executor(None, DownloadCache.place, hit["path"], self.save_path)
+        self.on_progress(hit["size"], hit["size"], 0, 0)
+        self._finish(DONE, DownloadCache.UNCHANGED)
+        return True
+
+    async def _complete(self, size):
+        self._finish(*await asyncio.get_running_loop().run_in_executor(None, self._verify, size))
+
+    async def _multi(self, total):
+        loop = asyncio.get_running_loop()
+        journal = await loop.run_in_executor(None, self._open_journal, total)
+        sched = SegmentScheduler(journal)
+        errors = []
+        tel = self.telemetry
+        mirrors = None
+        if self.mirrors:
+            infos = await asyncio.gather(*(self._probe(m) for m in self.mirrors))
+            mirrors = MirrorSet.verified(self.url, self.info, self.mirrors, infos)
+            if len(mirrors) < 2: mirrors = None
+
+        async def dl_chunk(i, url):
+            s, e, pos = journal.segments[i]
+            if pos > e: return
+            stat = tel.segment(i)
+            stat.begin(url)
+            try:
+                resp = await self.engine.http.request("GET", url, {'Range': f'bytes={pos}-{e}', **IDENTITY}, timeout=60)
+                try:
+                    resp.raise_for_status()
+                    fd = os.open(self.save_path, os.O_WRONLY | getattr(os, "O_BINARY", 0))
+                    try:
+                        writer = BlockWriter(fd, pos, WRITE_BLOCK, self._flushed(journal, i), end=lambda: journal.segments[i][1])
+                        sched.track(i, writer)
+                        await self._receive(resp, writer, True, stat)
+                    finally:
+                        os.close(fd)
+                finally:
+                    resp.close()
+            finally:
+                stat.end()
+
+        tuner = ConnectionTuner(self.num_threads) if self.auto else None
+        live = [0]
+
+        async def fetch(i):
+            attempt = 0
+            while not self._cancel:
+                if mirrors and mirrors.ready_in(): await self._backoff(mirrors.ready_in())
+                url = mirrors.pick() if mirrors else self.url
+                t0, pos0 = time.time(), journal.segments[i][2]
+                try:
+                    if url is None: raise IOError("כל המראות נכשלו")
+                    await dl_chunk(i, url)
+                    if mirrors: mirrors.done(url, journal.segments[i][2] - pos0, time.time() - t0)
+                    return
+                except ConnectionReleased:
+                    if mirrors: mirrors.done(url, 0, 0)
+                    await self._gate()
+                    attempt = 0
+                except Exception as ex:
+                    attempt, delay = self._after_failure(ex, i, url, pos0, attempt, journal, sched, mirrors, tuner)
+                    if delay is None: return
+                    await self._backoff(delay)
+
+        async def dl_loop():
+            try:
+                while not self._cancel:
+                    if tuner and live[0] > tuner.target: return
+                    i = sched.next()
+                    if i is None: return
+                    try:
+                        await fetch(i)
+                    except Exception as ex:
+                        errors.append(str(ex) or type(ex).__name__); sched.stop()
+                    finally:
+                        sched.release(i)
+            finally:
+                live[0] -= 1
+
+        def spawn():
+            live[0] += 1
+            return asyncio.ensure_future(dl_loop())
+
+        tasks = [spawn() for _ in range(tuner.target if tuner else self.num_threads)]
+        while True:
+            _, pending = await asyncio.wait(tasks, timeout=0.5)
+            if not pending: break
+            if self._paused and not self._cancel:
+                await self._idle(journal, total)
+                tel.restart()
+                if tuner: tuner.restart()
+                continue
+            now = time.time()
+            curr = tel.received()
+            self.on_progress(curr, total, *tel.tick(curr, now))
+            journal.save()
+            if self._hasher:
+                await loop.run_in_executor(None, self._hasher.catch_up, journal.frontier())
+            if tuner:
+                target = tuner.sample(curr, now)
+                tasks = [t for t in tasks if not t.done()]
+                for _ in range(target - live[0]): tasks.append(spawn())
+
+        failure = await loop.run_in_executor(None, self._multi_outcome, journal, total, errors)
+        if failure:
+            self._finish(*failure); return
+        await self._complete(total)